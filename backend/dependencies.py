@@ -1,10 +1,101 @@
-from fastapi import Depends, HTTPException, status
+import os
+import hashlib
+import secrets
+import ipaddress
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from backend.utils.jwt_utils import verify_access_token
+from backend.utils.jwt_utils import verify_access_token, JWT_SECRET
 from backend.utils.oauth_utils import check_authorized_user
+from backend.utils.rate_limit import rate_limiter, retry_after
 
 security = HTTPBearer()
 
+# Salt for hashing client addresses so logs never hold raw IPs
+CLIENT_HASH_SALT = os.getenv("CLIENT_HASH_SALT") or JWT_SECRET
+
+# Peers whose X-Forwarded-For / X-Real-IP headers are believed: loopback and
+# the private ranges docker puts nginx and cloudflared on by default
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.getenv(
+        "TRUSTED_PROXIES", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    ).split(",")
+    if network.strip()
+]
+
+# Anonymous per-browser id, so devices sharing one address get their own limits
+DEVICE_COOKIE = "lsd_device"
+DEVICE_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(request: Request) -> str:
+    """
+    Best guess at the visitor's address behind cloudflared and nginx.
+    Forwarded headers count only when the peer is a trusted proxy. Each
+    proxy appends the address it saw to X-Forwarded-For, so the client is
+    the rightmost hop that is not itself a trusted proxy; hops further left
+    came from the client and may be forged.
+    """
+    peer = request.client.host if request.client else ""
+    if not _is_trusted_proxy(peer):
+        return peer or "unknown"
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if not hops and request.headers.get("x-real-ip"):
+        hops = [request.headers["x-real-ip"].strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    # Every hop is a trusted network (a LAN visitor); the first is the origin
+    return hops[0] if hops else peer
+
+
+async def get_client_id(request: Request) -> str:
+    """
+    Dependency giving a stable, anonymous id for the requesting client.
+    """
+    digest = hashlib.sha256(f"{CLIENT_HASH_SALT}:{client_address(request)}".encode())
+    return digest.hexdigest()[:16]
+
+
+def rate_limit(name: str):
+    """
+    Dependency factory enforcing the named limit from rate_limit.RATE_LIMITS.
+    Issues a device cookie on first use and answers 429 with Retry-After.
+    """
+    async def check_rate_limit(
+        request: Request,
+        response: Response,
+        client_id: str = Depends(get_client_id)
+    ):
+        device_id = request.cookies.get(DEVICE_COOKIE)
+        if not device_id or len(device_id) > 64:
+            device_id = None
+            response.set_cookie(
+                key=DEVICE_COOKIE,
+                value=secrets.token_urlsafe(16),
+                max_age=DEVICE_COOKIE_MAX_AGE,
+                httponly=True,
+                samesite="lax"
+            )
+
+        wait = await rate_limiter.check(name, client_id, device_id)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="You're sending requests too quickly. Please wait a bit and try again.",
+                headers={"Retry-After": retry_after(wait)}
+            )
+
+    return check_rate_limit
+
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """
@@ -33,6 +124,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             "picture": ""
         }
 
+    except HTTPException:
+        raise
     except ValueError as e:
         # Invalid or expired token
         raise HTTPException(
@@ -1,23 +1,70 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-import threading
+from contextlib import asynccontextmanager
 import os
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 
 from backend.routers import auth, songs, admin
-from backend.utils.queueing import song_queue_manager
-from backend.utils.fpp_commands import lights_on, lights_off
+from backend.utils.show_runtime import show_runtime
+from backend.utils.fpp_client import fpp_client
+from backend.utils.oauth_utils import close_google_client
+from backend.utils.webhook_outbox import webhook_outbox
+from backend.utils.request_log import request_log
+from backend.utils.analytics import request_analytics
+from backend.utils.queue_store import queue_store
+from backend.utils.tracing import play_tracer
+from backend.utils.redis_client import (
+    init_redis_pool,
+    close_redis_pool,
+    migrate_token_records,
+    backfill_session_index
+)
+from backend.utils.http_cache import file_etag, etag_matches, cache_headers, not_modified
+from backend.utils.metrics import registry, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+# Bearer token required by /api/metrics; the endpoint is open when unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the show (player and lights schedule) for the life of the app."""
+    init_redis_pool()
+    try:
+        try:
+            await migrate_token_records()
+            await backfill_session_index()
+        except Exception as e:
+            print(f"[REDIS] Token storage upgrade skipped: {e}")
+        # Inside the try so a failed startup still stops what already started
+        await webhook_outbox.start()
+        await request_log.start()
+        await request_analytics.start()
+        await queue_store.restore()
+        await show_runtime.start()
+        await queue_store.start()
+        yield
+    finally:
+        # Save before the runtime clears the playing song, so it is replayed
+        await queue_store.stop()
+        await show_runtime.stop()
+        await webhook_outbox.stop()
+        await request_log.stop()
+        await request_analytics.stop()
+        await play_tracer.close()
+        await fpp_client.close()
+        await close_redis_pool()
+        await close_google_client()
+        print("[SHUTDOWN] Application shutting down")
+
 
 app = FastAPI(
     title="Christmas Lightshow API",
     description="API for managing Christmas lightshow song requests and controls",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
-# Initialize scheduler
-scheduler = BackgroundScheduler()
-
 # CORS configuration - allow frontend origin
 origins = [
     "http://localhost:5173",  # Vite dev server
@@ -32,6 +79,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
@@ -39,26 +87,6 @@ app.include_router(songs.router, prefix="/api/songs", tags=["songs"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Start the song queue background thread on application startup."""
-    threading.Thread(target=song_queue_manager.loop_songs, daemon=True).start()
-    print("[STARTUP] Song queue manager thread started")
-
-    # Schedule lights on/off
-    scheduler.add_job(lights_on, CronTrigger(hour=17, minute=0))  # 5:00 PM
-    scheduler.add_job(lights_off, CronTrigger(hour=23, minute=0))  # 11:00 PM
-    scheduler.start()
-    print("[STARTUP] Light scheduler started (ON: 5:00 PM, OFF: 11:00 PM)")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on application shutdown."""
-    scheduler.shutdown()
-    print("[SHUTDOWN] Application shutting down")
-
-
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
@@ -68,18 +96,34 @@ async def health_check():
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics(request: Request):
+    """Prometheus metrics for the queues, player, FPP, Redis, webhooks and API."""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        return JSONResponse({"detail": "Invalid metrics token"}, status_code=401)
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+BANNER_CACHE_CONTROL = "public, max-age=60"
+
+
 @app.get("/api/banner")
-async def get_banner():
+async def get_banner(request: Request):
     """Get banner content from banner.md file."""
     banner_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "banner.md")
 
     try:
-        if os.path.exists(banner_path):
-            with open(banner_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-            return {"content": content if content else None}
-        else:
+        etag = file_etag(banner_path)
+        if etag is None:
             return {"content": None}
+        if etag_matches(request, etag):
+            return not_modified(etag, BANNER_CACHE_CONTROL)
+        with open(banner_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        return JSONResponse(
+            {"content": content if content else None},
+            headers=cache_headers(etag, BANNER_CACHE_CONTROL)
+        )
     except Exception as e:
         print(f"[ERROR] Failed to read banner: {e}")
         return {"content": None}
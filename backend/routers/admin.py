@@ -1,10 +1,27 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel
-from typing import Literal
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import StreamingResponse
+import asyncio
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import datetime as dt
+import json
 
 from backend.dependencies import get_current_user
 from backend.utils.queueing import song_queue_manager
+from backend.utils.song_queue import QueueFullError
+from backend.utils.catalog import song_catalog
 from backend.utils import fpp_commands
+from backend.utils.fpp_client import fpp_client, FPPError
+from backend.utils.fseq_index import fseq_index
+from backend.utils.redis_client import redis_stats
+from backend.utils.jwt_utils import token_cache
+from backend.utils.oauth_utils import allow_list
+from backend.utils.webhook_outbox import webhook_outbox
+from backend.utils.request_log import request_log, read_request_log
+from backend.utils.analytics import request_analytics
+from backend.utils.rate_limit import rate_limiter
+from backend.utils.autofill import playlist_autofill
+from backend.utils.tracing import play_tracer
 
 router = APIRouter()
 
@@ -13,10 +30,23 @@ class AdminSongRequest(BaseModel):
     song: str
 
 
+class AdminBatchRequest(BaseModel):
+    songs: List[str]
+    queue_type: Literal["admin", "system"] = "admin"
+
+
 class ClearQueueRequest(BaseModel):
     queue_type: Literal["admin", "requested", "system", "all"]
 
 
+class MoveEntryRequest(BaseModel):
+    position: Literal["front", "back"]
+
+
+class VolumeRequest(BaseModel):
+    level: int = Field(ge=0, le=100)
+
+
 @router.post("/songs/queue")
 async def add_to_admin_queue(
     request: AdminSongRequest,
@@ -31,13 +61,25 @@ async def add_to_admin_queue(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No song selected"
         )
-    
+
+    if request.song not in song_catalog:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Song '{request.song}' is not in the song list"
+        )
+
     try:
-        song_queue_manager.add_song(request.song, "admin")
+        entry = song_queue_manager.add_song(request.song, "admin")
         return {
             "message": f"Song '{request.song}' added to admin queue",
-            "song": request.song
+            "song": request.song,
+            "id": entry.id
         }
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -45,6 +87,95 @@ async def add_to_admin_queue(
         )
 
 
+@router.post("/songs/queue/batch")
+async def add_batch_to_queue(
+    request: AdminBatchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Add several songs to the admin or system queue in one call.
+    Either every song is queued or none are.
+    Requires authentication.
+    """
+    if not request.songs:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No songs selected"
+        )
+
+    unknown = [song for song in request.songs if song not in song_catalog]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Songs not in the song list: {', '.join(unknown)}"
+        )
+
+    try:
+        entries = song_queue_manager.add_songs(request.songs, request.queue_type)
+        return {
+            "message": f"{len(entries)} songs added to {request.queue_type} queue",
+            "ids": [entry.id for entry in entries]
+        }
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to add songs: {str(e)}"
+        )
+
+
+@router.get("/queue")
+async def get_queue_entries(current_user: dict = Depends(get_current_user)):
+    """
+    Get every queued entry with its id, for removal and reordering.
+    Requires authentication.
+    """
+    return {
+        "queues": song_queue_manager.peek_entries(),
+        "current_song": song_queue_manager.get_current_song()
+    }
+
+
+@router.delete("/queue/{entry_id}")
+async def remove_queue_entry(
+    entry_id: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Remove a single queued entry by id.
+    Requires authentication.
+    """
+    entry = song_queue_manager.remove_entry(entry_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Queue entry {entry_id} not found"
+        )
+    return {"message": f"Removed '{entry.song}' from {entry.queue_type} queue"}
+
+
+@router.post("/queue/{entry_id}/move")
+async def move_queue_entry(
+    entry_id: int,
+    request: MoveEntryRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Move a queued entry to the front or back of its queue.
+    Requires authentication.
+    """
+    if not song_queue_manager.move_entry(entry_id, request.position == "front"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Queue entry {entry_id} not found"
+        )
+    return {"message": f"Entry moved to the {request.position}"}
+
+
 @router.delete("/queue")
 async def clear_queue(
     request: ClearQueueRequest,
@@ -59,15 +190,7 @@ async def clear_queue(
             song_queue_manager.clear_queues()
             return {"message": "All queues cleared"}
         else:
-            # Clear specific queue
-            with song_queue_manager.lock:
-                if request.queue_type == "admin":
-                    song_queue_manager.admin_queue.clear()
-                elif request.queue_type == "requested":
-                    song_queue_manager.requested_queue.clear()
-                elif request.queue_type == "system":
-                    song_queue_manager.system_queue.clear()
-            
+            song_queue_manager.clear_queue(request.queue_type)
             return {"message": f"{request.queue_type.capitalize()} queue cleared"}
     except Exception as e:
         raise HTTPException(
@@ -83,7 +206,7 @@ async def turn_lights_on(current_user: dict = Depends(get_current_user)):
     Requires authentication.
     """
     try:
-        fpp_commands.lights_on()
+        await fpp_commands.lights_on()
         return {"message": "Lights turned on"}
     except Exception as e:
         raise HTTPException(
@@ -99,7 +222,7 @@ async def turn_lights_off(current_user: dict = Depends(get_current_user)):
     Requires authentication.
     """
     try:
-        fpp_commands.lights_off()
+        await fpp_commands.lights_off()
         return {"message": "Lights turned off"}
     except Exception as e:
         raise HTTPException(
@@ -115,7 +238,7 @@ async def stop_current_song(current_user: dict = Depends(get_current_user)):
     Requires authentication.
     """
     try:
-        fpp_commands.stop_song()
+        await fpp_commands.stop_song()
         song_queue_manager.set_current_song(None)
         return {"message": "Song stopped"}
     except Exception as e:
@@ -133,8 +256,8 @@ async def emergency_shutdown(current_user: dict = Depends(get_current_user)):
     """
     try:
         song_queue_manager.clear_queues()
-        fpp_commands.stop_song()
-        fpp_commands.lights_off()
+        await fpp_commands.stop_song()
+        await fpp_commands.lights_off()
         song_queue_manager.set_current_song(None)
         return {"message": "Emergency shutdown complete"}
     except Exception as e:
@@ -142,3 +265,204 @@ async def emergency_shutdown(current_user: dict = Depends(get_current_user)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to execute shutdown: {str(e)}"
         )
+
+
+@router.get("/fpp/status")
+async def get_fpp_status(current_user: dict = Depends(get_current_user)):
+    """
+    Get the Falcon Player's current playlist, position and volume.
+    Requires authentication.
+    """
+    try:
+        fpp_status = await fpp_client.status()
+        return {
+            "playlist": fpp_status.playlist,
+            "status": fpp_status.status_name,
+            "seconds_played": fpp_status.seconds_played,
+            "seconds_remaining": fpp_status.seconds_remaining,
+            "volume": fpp_status.volume
+        }
+    except FPPError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=str(e)
+        )
+
+
+@router.post("/volume")
+async def set_volume(
+    request: VolumeRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Set the FPP output volume (0-100).
+    Requires authentication.
+    """
+    try:
+        await fpp_client.set_volume(request.level)
+        return {"message": f"Volume set to {request.level}"}
+    except FPPError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=str(e)
+        )
+
+
+@router.post("/fseq/reindex")
+async def reindex_sequences(current_user: dict = Depends(get_current_user)):
+    """
+    Rescan the FSEQ directory; only new or changed files are parsed.
+    Requires authentication.
+    """
+    if not fseq_index.sequence_dir:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="FSEQ_DIR is not configured"
+        )
+    try:
+        result = await asyncio.to_thread(fseq_index.scan)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to index sequences: {str(e)}"
+        )
+    if "error" in result:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to index sequences: {result['error']}"
+        )
+    return result
+
+
+@router.get("/redis/stats")
+async def get_redis_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Get call counts and latency for each Redis helper.
+    Requires authentication.
+    """
+    return {"operations": redis_stats.snapshot()}
+
+
+@router.get("/auth/stats")
+async def get_auth_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Get verified-token cache counters and allow list size.
+    Requires authentication.
+    """
+    return {
+        "token_cache": token_cache.stats(),
+        "allow_list": {"size": len(allow_list.emails), "version": allow_list.version}
+    }
+
+
+@router.post("/allow-list/reload")
+async def reload_allow_list(current_user: dict = Depends(get_current_user)):
+    """
+    Re-read ALLOW_LIST_FILE now instead of waiting for the next check.
+    Requires authentication.
+    """
+    emails = allow_list.reload()
+    return {"message": f"Allow list reloaded ({len(emails)} emails)"}
+
+
+@router.get("/webhooks/stats")
+async def get_webhook_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Get N8N outbox depth and delivery counters.
+    Requires authentication.
+    """
+    return webhook_outbox.stats()
+
+
+@router.get("/traces")
+async def get_play_traces(
+    limit: int = Query(20, ge=1, le=200),
+    format: Literal["json", "otlp"] = "json",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get stage timings for recently played songs, newest first, with the
+    average time spent in each stage. format=otlp returns OpenTelemetry JSON.
+    Requires authentication.
+    """
+    if format == "otlp":
+        return play_tracer.to_otlp(list(play_tracer.traces)[-limit:])
+    return {
+        "traces": play_tracer.recent(limit),
+        "breakdown": play_tracer.breakdown(),
+        "export_failures": play_tracer.export_failures
+    }
+
+
+@router.get("/autofill")
+async def get_autofill_status(current_user: dict = Depends(get_current_user)):
+    """
+    Get where system queue fills come from and how many were added.
+    Requires authentication.
+    """
+    return playlist_autofill.status()
+
+
+@router.get("/rate-limits/stats")
+async def get_rate_limit_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Get configured public endpoint limits and allowed/limited counts.
+    Requires authentication.
+    """
+    return rate_limiter.stats()
+
+
+@router.get("/requests/log")
+async def export_request_log(
+    since: Optional[dt.datetime] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream the structured request log (all segments) as JSON lines.
+    Requires authentication.
+    """
+    records = read_request_log(request_log.path, since)
+    return StreamingResponse(
+        (json.dumps(record) + "\n" for record in records),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/analytics")
+async def get_request_analytics(
+    night: Optional[dt.date] = None,
+    top: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get top songs, request rate and unique visitors for one night (default tonight).
+    Requires authentication.
+    """
+    night = night or dt.date.today()
+    try:
+        summary = await request_analytics.night_summary(night.isoformat(), top)
+        summary["top_songs_all_time"] = await request_analytics.top_all_time(top)
+        return summary
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load analytics: {str(e)}"
+        )
+
+
+@router.get("/analytics/nights")
+async def get_analytics_nights(
+    limit: int = Query(30, ge=1, le=365),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get request totals and unique visitors for recent nights.
+    Requires authentication.
+    """
+    try:
+        return {"nights": await request_analytics.nights(limit)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load analytics: {str(e)}"
+        )
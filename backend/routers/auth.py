@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status, Response, Request, Cookie
+from fastapi import APIRouter, HTTPException, status, Response, Request, Cookie, Depends
 from pydantic import BaseModel
 from typing import Optional
 import os
@@ -16,13 +16,15 @@ from backend.utils.jwt_utils import (
     get_refresh_token_expiry_seconds
 )
 from backend.utils.redis_client import (
+    REUSE_DETECTED,
+    EXPIRED,
     store_refresh_token,
-    get_refresh_token_data,
+    rotate_refresh_token,
     revoke_refresh_token,
     revoke_all_user_tokens,
-    is_token_revoked,
-    mark_token_as_revoked
+    list_user_sessions
 )
+from backend.dependencies import get_current_user
 
 router = APIRouter()
 
@@ -77,7 +79,7 @@ async def handle_callback(code: str, response: Response):
     """
     try:
         # Exchange code for Google tokens and get user info
-        user_info = exchange_code_for_tokens_google(code)
+        user_info = await exchange_code_for_tokens_google(code)
         email = user_info["email"]
         name = user_info["name"]
         picture = user_info.get("picture", "")
@@ -100,7 +102,7 @@ async def handle_callback(code: str, response: Response):
         token_key = hashlib.sha256(refresh_token.encode()).hexdigest()
 
         # Store refresh token in Redis
-        store_refresh_token(
+        await store_refresh_token(
             token_hash=token_key,
             user_email=email,
             expires_in_seconds=get_refresh_token_expiry_seconds()
@@ -158,76 +160,48 @@ async def refresh_token(
         )
 
     try:
-        # Hash the token to look it up in Redis
-        # Note: We need to iterate through stored hashes to find a match
-        # This is a limitation of bcrypt - we can't hash and lookup directly
-        # In a production system, you might want to use a different approach
-        # For now, we'll store the token hash as the key itself
-
-        # Actually, let's change the approach: store the raw token as key (hashed with SHA256)
-        # and the data as value. This is more efficient for lookup.
-        # Let me update redis_client.py approach
-
-        # For now, let's use SHA256 for the Redis key (fast lookup)
-        # and verify with bcrypt if needed (though we trust Redis)
+        # SHA256 of the token is the Redis key (fast lookup)
         import hashlib
         token_key = hashlib.sha256(refresh_token.encode()).hexdigest()
 
-        token_data = get_refresh_token_data(token_key)
+        # Generate new refresh token
+        new_refresh_token = generate_refresh_token()
+        new_token_key = hashlib.sha256(new_refresh_token.encode()).hexdigest()
+
+        # Check for reuse, invalidate the old token and store the new one
+        # in a single atomic Redis call
+        outcome, user_email = await rotate_refresh_token(
+            old_token_hash=token_key,
+            new_token_hash=new_token_key,
+            expires_in_seconds=get_refresh_token_expiry_seconds()
+        )
 
-        if not token_data:
+        if outcome == EXPIRED:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired refresh token"
             )
 
-        # Check if token was revoked (reuse detection)
-        if is_token_revoked(token_key):
-            # Token reuse detected! Revoke all user tokens
-            user_email = token_data.get("user_email")
-            if user_email:
-                print(f"[AUTH] Token reuse detected for {user_email}! Revoking all tokens.")
-                revoke_all_user_tokens(user_email)
-
+        if outcome == REUSE_DETECTED:
+            print(f"[AUTH] Token reuse detected for {user_email}! Revoked all tokens.")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token reuse detected. All sessions invalidated. Please sign in again."
             )
 
-        user_email = token_data.get("user_email")
-        if not user_email:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token data"
-            )
-
         # Check if user is still authorized
         if not check_authorized_user(user_email):
-            revoke_refresh_token(token_key)
+            await revoke_refresh_token(new_token_key)
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"User {user_email} is no longer authorized"
             )
 
-        # Invalidate old refresh token (rotation)
-        revoke_refresh_token(token_key)
-
         # Create new access token
         # We don't have the user's name stored, so we'll use email
         # In a real system, you'd store this in Redis or fetch from DB
         access_token = create_access_token(user_email, user_email.split("@")[0])
 
-        # Generate new refresh token
-        new_refresh_token = generate_refresh_token()
-        new_token_key = hashlib.sha256(new_refresh_token.encode()).hexdigest()
-
-        # Store new refresh token in Redis
-        store_refresh_token(
-            token_hash=new_token_key,
-            user_email=user_email,
-            expires_in_seconds=get_refresh_token_expiry_seconds()
-        )
-
         # Set new HttpOnly cookie
         response.set_cookie(
             key=COOKIE_NAME,
@@ -265,7 +239,7 @@ async def logout(
         try:
             import hashlib
             token_key = hashlib.sha256(refresh_token.encode()).hexdigest()
-            revoke_refresh_token(token_key)
+            await revoke_refresh_token(token_key)
         except Exception as e:
             print(f"[AUTH] Logout error: {e}")
 
@@ -313,3 +287,53 @@ async def get_current_user_info(request: Request):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e)
         )
+
+
+@router.get("/sessions")
+async def get_my_sessions(
+    current_user: dict = Depends(get_current_user),
+    refresh_token: Optional[str] = Cookie(None, alias="refresh_token")
+):
+    """
+    List the signed-in user's active refresh sessions, newest first.
+    The session belonging to this browser is flagged as current.
+    """
+    import hashlib
+    current_key = hashlib.sha256(refresh_token.encode()).hexdigest() if refresh_token else None
+
+    try:
+        sessions = await list_user_sessions(current_user["email"])
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list sessions: {str(e)}"
+        )
+
+    for session in sessions:
+        token_hash = session.pop("token_hash")
+        session["id"] = token_hash[:12]
+        session["current"] = token_hash == current_key
+    return {"sessions": sessions}
+
+
+@router.post("/sessions/revoke-all")
+async def revoke_my_sessions(
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Sign out every session of the signed-in user, including this one.
+    """
+    try:
+        revoked = await revoke_all_user_tokens(current_user["email"])
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to revoke sessions: {str(e)}"
+        )
+
+    response.delete_cookie(
+        key=COOKIE_NAME,
+        path=COOKIE_PATH
+    )
+    return {"message": f"Revoked {revoked} sessions"}
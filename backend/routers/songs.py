@@ -1,14 +1,47 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Request, Response, Query, Depends
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import os
+import json
 import datetime as dt
-import httpx
 
-from backend.utils.queueing import song_queue_manager, get_song_list, check_time
+from backend.utils.queueing import song_queue_manager, check_time
+from backend.utils.schedule import show_schedule
+from backend.utils.catalog import song_catalog
+from backend.utils.song_queue import QueueFullError, RecentlyPlayedError, RequesterLimitError
+from backend.utils.request_log import request_log
+from backend.utils.analytics import request_analytics
+from backend.dependencies import get_client_id, rate_limit
+from backend.utils.webhook_outbox import webhook_outbox, N8N_WEBHOOK_URL, N8N_WEBHOOK_URL_PLAYEDAUDIO
+from backend.utils.http_cache import (
+    BOOT_ID,
+    make_etag,
+    etag_matches,
+    cache_headers,
+    not_modified
+)
 
 router = APIRouter()
 
+# Seconds between keep-alive comments on idle queue streams; must stay below
+# the nginx proxy_read_timeout (60s default) so idle streams are not cut.
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_RETRY_MS = 3000
+
+# Long-poll requests (?since=) are answered after at most this many seconds,
+# well inside the nginx and Cloudflare read timeouts
+LONG_POLL_TIMEOUT_SECONDS = float(os.getenv("LONG_POLL_TIMEOUT_SECONDS", "25"))
+
+QUEUE_CACHE_CONTROL = "no-cache"
+SONG_LIST_CACHE_CONTROL = "public, max-age=60"
+
+# Last encoded queue status, shared by polls and streams for a given version
+_queue_json: tuple[int, str] | None = None
+
+# Last encoded full song list, keyed by catalog version
+_song_list_json: tuple[int, str] | None = None
+
 
 class SongRequest(BaseModel):
     song: str
@@ -19,18 +52,59 @@ class CustomSongRequest(BaseModel):
 
 
 class QueueStatus(BaseModel):
+    version: int = 0
     admin_queue: List[str]
     requested_queue: List[str]
+    requested_votes: List[int] = []
+    scheduler: Optional[dict] = None
     system_queue: List[str]
     current_song: Optional[str]
 
 
+def _full_song_list_json() -> str:
+    """Encode the whole catalog once per catalog version."""
+    global _song_list_json
+    songs = song_catalog.songs
+    if _song_list_json is None or _song_list_json[0] != song_catalog.version:
+        body = json.dumps({"songs": songs, "total": len(songs)})
+        _song_list_json = (song_catalog.version, body)
+    return _song_list_json[1]
+
+
 @router.get("/list")
-async def get_songs():
-    """Get the list of available songs."""
+async def get_songs(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500)
+):
+    """
+    Get the list of available songs.
+    Returns the whole catalog, or one page of it when limit is given.
+    """
     try:
-        songs = get_song_list()
-        return {"songs": songs}
+        etag = song_catalog.etag
+        if etag_matches(request, etag):
+            return not_modified(etag, SONG_LIST_CACHE_CONTROL)
+        headers = cache_headers(etag, SONG_LIST_CACHE_CONTROL)
+
+        if limit is None and offset == 0:
+            return Response(
+                content=_full_song_list_json(),
+                media_type="application/json",
+                headers=headers
+            )
+        limit = limit or 50
+        page = song_catalog.page(offset, limit)
+        return JSONResponse(
+            {
+                "songs": page,
+                "durations": song_catalog.durations(page),
+                "total": len(song_catalog),
+                "offset": offset,
+                "limit": limit
+            },
+            headers=headers
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -38,15 +112,42 @@ async def get_songs():
         )
 
 
+@router.get("/search")
+async def search_songs(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Search songs by name prefix, word prefix or close spelling."""
+    return {"songs": song_catalog.search(q, limit)}
+
+
+def _queue_status_json() -> tuple[int, str]:
+    """Return (version, encoded QueueStatus), encoding once per version."""
+    global _queue_json
+    if _queue_json is None or _queue_json[0] != song_queue_manager.version:
+        queue_status = QueueStatus(**song_queue_manager.snapshot())
+        _queue_json = (queue_status.version, queue_status.model_dump_json())
+    return _queue_json
+
+
 @router.get("/queue", response_model=QueueStatus)
-async def get_queue_status():
-    """Get current queue status for all queues."""
+async def get_queue_status(request: Request, since: Optional[int] = None):
+    """
+    Get current queue status for all queues.
+    With ?since=<version>, waits until the queue changes from that version.
+    """
     try:
-        return QueueStatus(
-            admin_queue=song_queue_manager.peek_queues("admin") or [],
-            requested_queue=song_queue_manager.peek_queues("requested") or [],
-            system_queue=song_queue_manager.peek_queues("system") or [],
-            current_song=song_queue_manager.get_current_song()
+        if since is not None:
+            await song_queue_manager.wait_for_change(since, LONG_POLL_TIMEOUT_SECONDS)
+
+        version, body = _queue_status_json()
+        etag = make_etag(BOOT_ID, "q", version)
+        if etag_matches(request, etag):
+            return not_modified(etag, QUEUE_CACHE_CONTROL)
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers=cache_headers(etag, QUEUE_CACHE_CONTROL)
         )
     except Exception as e:
         raise HTTPException(
@@ -55,8 +156,56 @@ async def get_queue_status():
         )
 
 
-@router.post("/request")
-async def request_song(request: SongRequest):
+def _snapshot_frame() -> tuple[int, str]:
+    version, body = _queue_status_json()
+    return version, f"data: {body}\n\n"
+
+
+async def _queue_event_stream():
+    version, frame = _snapshot_frame()
+    yield f"retry: {SSE_RETRY_MS}\n" + frame
+    while True:
+        if await song_queue_manager.wait_for_change(version, SSE_HEARTBEAT_SECONDS):
+            version, frame = _snapshot_frame()
+            yield frame
+        else:
+            yield ": heartbeat\n\n"
+
+
+@router.get("/queue/stream")
+async def stream_queue_status():
+    """
+    Server-Sent Events stream of queue status.
+    Sends a snapshot on connect and again only when the queues change.
+    """
+    return StreamingResponse(
+        _queue_event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Stop nginx buffering the stream
+        }
+    )
+
+
+def _closed_message() -> str:
+    next_open = show_schedule.next_open()
+    if next_open is None:
+        return "Song requests are closed. No upcoming shows are scheduled."
+    when = next_open.strftime("%I:%M %p").lstrip("0")
+    if next_open.date() != dt.date.today():
+        when += next_open.strftime(" on %A, %B %d")
+    return f"Song requests are closed right now. The show opens again at {when}."
+
+
+@router.get("/schedule")
+async def get_schedule():
+    """Get whether the show is open, today's hours and the next opening."""
+    return show_schedule.status()
+
+
+@router.post("/request", dependencies=[Depends(rate_limit("song_request"))])
+async def request_song(request: SongRequest, client_id: str = Depends(get_client_id)):
     """
     Request a song to be added to the queue (public endpoint).
     Songs can only be requested during allowed hours.
@@ -66,50 +215,74 @@ async def request_song(request: SongRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No song selected"
         )
-    
+
+    if request.song not in song_catalog:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Song '{request.song}' is not in the song list"
+        )
+
     # Check if within allowed time
     if not check_time():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Current time is outside the allowed range of 5:00 PM - 9:00 PM"
+            detail=_closed_message()
         )
     
     try:
-        # Add to requested queue
-        song_queue_manager.add_song(request.song, "requested")
-
-        # Log the request
-        with open('song_requests.txt', 'a') as f:
-            timestamp = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"{timestamp} - {request.song}\n")
-
-        # Send webhook notification to N8N
-        try:
-            webhook_url = os.getenv('N8N_WEBHOOK_URL_PLAYEDAUDIO')
-            token = os.getenv('N8N_TOKEN')
-
-            if webhook_url and token:
-                async with httpx.AsyncClient() as client:
-                    await client.post(
-                        webhook_url,
-                        json={
-                            "song": request.song,
-                            "timestamp": dt.datetime.now().isoformat(),
-                            "queue_type": "requested"
-                        },
-                        headers={
-                            "Authorization": f"Bearer {token}"
-                        },
-                        timeout=5.0
-                    )
-        except Exception as webhook_error:
-            # Log webhook errors but don't fail the request
-            print(f"Webhook notification failed: {webhook_error}")
+        # Add to requested queue, or vote for the entry already holding the song
+        entry, counted = song_queue_manager.request_song(request.song, voter=client_id)
+        if not counted:
+            return {
+                "message": f"You've already requested '{request.song}'. It's in the queue.",
+                "song": request.song,
+                "votes": entry.votes
+            }
+
+        # Log the request (written to disk in the background)
+        request_log.log(
+            request.song,
+            "requested",
+            client=client_id,
+            position=song_queue_manager.position(entry.id)
+        )
+        request_analytics.record(request.song, client_id)
 
+        # Notify N8N in the background
+        webhook_outbox.enqueue(
+            N8N_WEBHOOK_URL_PLAYEDAUDIO,
+            {
+                "song": request.song,
+                "timestamp": dt.datetime.now().isoformat(),
+                "queue_type": "requested"
+            },
+            kind="song_request"
+        )
+
+        if entry.votes > 1:
+            message = f"Your vote for '{request.song}' has been counted. It now has {entry.votes} votes!"
+        else:
+            message = f"Your song '{request.song}' has been added to the queue!"
         return {
-            "message": f"Your song '{request.song}' has been added to the queue!",
-            "song": request.song
+            "message": message,
+            "song": request.song,
+            "votes": entry.votes
         }
+    except RecentlyPlayedError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"'{request.song}' was played recently. Please pick another song or try again later."
+        )
+    except RequesterLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"You already have {e.limit} songs waiting. Please wait for one to play before requesting more."
+        )
+    except QueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="The request queue is full right now. Please try again after a few songs have played."
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -117,7 +290,7 @@ async def request_song(request: SongRequest):
         )
 
 
-@router.post("/request-custom")
+@router.post("/request-custom", dependencies=[Depends(rate_limit("custom_request"))])
 async def submit_custom_request(request: CustomSongRequest):
     """
     Submit a custom song request via email.
@@ -128,29 +301,21 @@ async def submit_custom_request(request: CustomSongRequest):
             detail="Request text cannot be empty"
         )
     
-    try:
-        # Send to N8N webhook
-        webhook_url = os.getenv('N8N_WEBHOOK_URL')
-        token = os.getenv('N8N_TOKEN')
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                webhook_url,
-                json={
-                    "subject": "LightshowPi Song Request",
-                    "request": request.request_text
-                },
-                headers={
-                    "Authorization": f"Bearer {token}"
-                }
-            )
-            response.raise_for_status()
-
-        return {
-            "message": "Your request has been submitted. Please check back at a later date."
-        }
-    except Exception as e:
+    # Delivered to N8N in the background, with retries
+    queued = webhook_outbox.enqueue(
+        N8N_WEBHOOK_URL,
+        {
+            "subject": "LightshowPi Song Request",
+            "request": request.request_text
+        },
+        kind="custom_request"
+    )
+    if not queued:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to submit request: {str(e)}"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Custom requests can't be accepted right now. Please try again later."
         )
+
+    return {
+        "message": "Your request has been submitted. Please check back at a later date."
+    }
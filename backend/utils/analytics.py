@@ -0,0 +1,178 @@
+
+import os
+import asyncio
+import datetime as dt
+from collections import Counter
+
+from backend.utils.redis_client import get_redis_client, timed
+
+
+# Nightly keys expire after this many days; the all-time song ranking is kept
+ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', '120'))
+ANALYTICS_FLUSH_SECONDS = 1.0
+# Minutes averaged for the "current" request rate
+RATE_WINDOW_MINUTES = 5
+
+NIGHTS_KEY = "analytics:nights"
+ALL_TIME_SONGS_KEY = "analytics:songs:all"
+
+
+def _songs_key(night: str) -> str:
+    """Sorted set: song -> requests that night."""
+    return f"analytics:songs:{night}"
+
+
+def _minutes_key(night: str) -> str:
+    """Hash: "HH:MM" -> requests in that minute."""
+    return f"analytics:minutes:{night}"
+
+
+def _visitors_key(night: str) -> str:
+    """HyperLogLog of client ids seen that night."""
+    return f"analytics:visitors:{night}"
+
+
+def _total_key(night: str) -> str:
+    return f"analytics:total:{night}"
+
+
+class RequestAnalytics:
+    """
+    Live request counters kept in Redis.
+    Requests are tallied in memory and pushed every second as one pipeline
+    of O(1) updates (ZINCRBY, HINCRBY, PFADD, INCRBY), so the request path
+    never waits on Redis and a Redis outage only loses the unsent tally.
+    """
+
+    def __init__(self):
+        self._songs: Counter = Counter()
+        self._minutes: Counter = Counter()
+        self._visitors: set[tuple[str, str]] = set()
+        self._task: asyncio.Task | None = None
+        self.dropped = 0
+
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flusher(), name="request-analytics")
+
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+
+    def record(self, song: str, client_id: str | None = None, at: dt.datetime | None = None):
+        at = at or dt.datetime.now()
+        night = at.date().isoformat()
+        self._songs[(night, song)] += 1
+        self._minutes[(night, at.strftime("%H:%M"))] += 1
+        if client_id:
+            self._visitors.add((night, client_id))
+
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(ANALYTICS_FLUSH_SECONDS)
+            await self.flush()
+
+
+    async def flush(self):
+        if not self._songs:
+            return
+        songs, self._songs = self._songs, Counter()
+        minutes, self._minutes = self._minutes, Counter()
+        visitors, self._visitors = self._visitors, set()
+
+        ttl = ANALYTICS_RETENTION_DAYS * 24 * 60 * 60
+        nights: Counter = Counter()
+        pipe = get_redis_client().pipeline(transaction=False)
+        for (night, song), count in songs.items():
+            pipe.zincrby(_songs_key(night), count, song)
+            pipe.zincrby(ALL_TIME_SONGS_KEY, count, song)
+            nights[night] += count
+        for (night, minute), count in minutes.items():
+            pipe.hincrby(_minutes_key(night), minute, count)
+        by_night: dict[str, list[str]] = {}
+        for night, client_id in visitors:
+            by_night.setdefault(night, []).append(client_id)
+        for night, client_ids in by_night.items():
+            pipe.pfadd(_visitors_key(night), *client_ids)
+        for night, count in nights.items():
+            pipe.incrby(_total_key(night), count)
+            pipe.zadd(NIGHTS_KEY, {night: dt.date.fromisoformat(night).toordinal()})
+            for key in (_songs_key(night), _minutes_key(night), _visitors_key(night), _total_key(night)):
+                pipe.expire(key, ttl)
+
+        try:
+            with timed("analytics_flush"):
+                await pipe.execute()
+        except Exception as e:
+            self.dropped += sum(nights.values())
+            print(f"[ANALYTICS] Failed to record {sum(nights.values())} requests: {e}")
+
+
+    async def night_summary(self, night: str, top: int = 10) -> dict:
+        """Top songs, totals, unique visitors and per-minute rate for one night."""
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.zrevrange(_songs_key(night), 0, top - 1, withscores=True)
+        pipe.get(_total_key(night))
+        pipe.pfcount(_visitors_key(night))
+        pipe.hgetall(_minutes_key(night))
+        with timed("analytics_summary"):
+            top_songs, total, visitors, minutes = await pipe.execute()
+
+        per_minute = {minute: int(count) for minute, count in sorted(minutes.items())}
+        peak = max(per_minute.items(), key=lambda item: item[1], default=(None, 0))
+        return {
+            "night": night,
+            "total_requests": int(total or 0),
+            "unique_visitors": visitors,
+            "top_songs": [{"song": song, "requests": int(score)} for song, score in top_songs],
+            "requests_per_minute": per_minute,
+            "peak_minute": {"minute": peak[0], "requests": peak[1]},
+            "current_rate_per_minute": self._recent_rate(night, per_minute)
+        }
+
+
+    @staticmethod
+    def _recent_rate(night: str, per_minute: dict[str, int]) -> float:
+        now = dt.datetime.now()
+        if now.date().isoformat() != night:
+            return 0.0
+        recent = [
+            (now - dt.timedelta(minutes=offset)).strftime("%H:%M")
+            for offset in range(RATE_WINDOW_MINUTES)
+        ]
+        return round(sum(per_minute.get(minute, 0) for minute in recent) / RATE_WINDOW_MINUTES, 2)
+
+
+    async def nights(self, limit: int = 30) -> list[dict]:
+        """Most recent nights with request totals and unique visitors."""
+        client = get_redis_client()
+        with timed("analytics_nights"):
+            nights = await client.zrevrange(NIGHTS_KEY, 0, limit - 1)
+            if not nights:
+                return []
+            pipe = client.pipeline(transaction=False)
+            for night in nights:
+                pipe.get(_total_key(night))
+                pipe.pfcount(_visitors_key(night))
+            results = await pipe.execute()
+        return [
+            {"night": night, "total_requests": int(total or 0), "unique_visitors": visitors}
+            for night, total, visitors in zip(nights, results[::2], results[1::2])
+        ]
+
+
+    async def top_all_time(self, top: int = 10) -> list[dict]:
+        with timed("analytics_top_all_time"):
+            songs = await get_redis_client().zrevrange(ALL_TIME_SONGS_KEY, 0, top - 1, withscores=True)
+        return [{"song": song, "requests": int(score)} for song, score in songs]
+
+
+# Create a global instance for the application to use
+request_analytics = RequestAnalytics()
@@ -0,0 +1,160 @@
+
+import os
+import json
+import math
+import time
+import random
+from typing import Iterator
+
+from backend.utils.catalog import song_catalog
+from backend.utils.analytics import request_analytics
+from backend.utils.queueing import SongQueueManager, song_queue_manager, check_time
+
+
+PLAYLIST_FILE = 'playlist.json'
+
+# Keep the system queue topped up with songs while nothing else is queued
+AUTOFILL = os.getenv('AUTOFILL', '1') == '1'
+# System songs kept ready ahead of the player
+AUTOFILL_LOOKAHEAD = int(os.getenv('AUTOFILL_LOOKAHEAD', '1'))
+# How often all-time request counts are re-read for shuffle weighting
+POPULARITY_REFRESH_SECONDS = 10 * 60
+POPULARITY_TOP = 500
+
+
+class PlaylistAutofill:
+    """
+    Fills the system queue so the display never goes dark.
+    Songs come lazily from a generator: playlist.json's song_list in order,
+    cycling, or when that is empty a shuffle of the whole catalog weighted
+    by all-time request counts. Songs played recently or already queued
+    are skipped. The system queue only plays when the admin and requested
+    queues are empty, so fills never jump ahead of requests.
+    """
+
+    def __init__(self, manager: SongQueueManager, path: str = PLAYLIST_FILE, lookahead: int = AUTOFILL_LOOKAHEAD):
+        self.manager = manager
+        self.path = path
+        self.lookahead = lookahead
+        self.enabled = AUTOFILL
+        self.playlist: list[str] = []
+        self.source = "catalog"
+        self.added = 0
+        self._stamp: tuple[int, int] | None = None
+        self._weights: dict[str, float] = {}
+        self._weights_at = 0.0
+        self._candidates: Iterator[str] | None = None
+
+
+    def _refresh_playlist(self):
+        """Re-read playlist.json if it changed; a new playlist restarts the cycle."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+
+        playlist = []
+        if stamp is not None:
+            try:
+                with open(self.path) as f:
+                    playlist = json.load(f).get("song_list") or []
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"[AUTOFILL] Failed to load {self.path}: {e}")
+        self.playlist = [song for song in playlist if isinstance(song, str)]
+        self._candidates = None
+        print(f"[AUTOFILL] Loaded {len(self.playlist)} playlist songs from {self.path}")
+
+
+    async def _refresh_weights(self):
+        if time.monotonic() - self._weights_at < POPULARITY_REFRESH_SECONDS:
+            return
+        self._weights_at = time.monotonic()
+        try:
+            top = await request_analytics.top_all_time(POPULARITY_TOP)
+        except Exception as e:
+            print(f"[AUTOFILL] Popularity unavailable, shuffling evenly: {e}")
+            return
+        self._weights = {item["song"]: 1 + math.log1p(item["requests"]) for item in top}
+
+
+    def _weighted_shuffle(self, songs: list[str]) -> list[str]:
+        """One pass over every song, popular songs tending to come first (Efraimidis-Spirakis)."""
+        keyed = [(random.random() ** (1 / self._weights.get(song, 1.0)), song) for song in songs]
+        keyed.sort(reverse=True)
+        return [song for _, song in keyed]
+
+
+    def _songs(self) -> Iterator[str]:
+        """
+        Endless stream of candidates; each pass re-reads the current source.
+        Playlist songs missing from the catalog are skipped, and a playlist
+        with none left falls back to the catalog.
+        """
+        while True:
+            songs = [song for song in self.playlist if song in song_catalog]
+            self.source = "playlist" if songs else "catalog"
+            if not songs:
+                songs = self._weighted_shuffle(list(song_catalog.songs))
+            if not songs:
+                return
+            yield from songs
+
+
+    def next_song(self) -> str | None:
+        """
+        Next candidate not played recently or already queued. If a full
+        pass finds only recent songs (a small catalog), repeat one rather
+        than leave the display dark.
+        """
+        if self._candidates is None:
+            self._candidates = self._songs()
+        fallback = None
+        for _ in range(max(len(self.playlist), len(song_catalog)) + 1):
+            song = next(self._candidates, None)
+            if song is None:
+                self._candidates = None
+                break
+            if self.manager.can_autofill(song):
+                return song
+            if fallback is None and self.manager.can_autofill(song, allow_recent=True):
+                fallback = song
+        return fallback
+
+
+    async def top_up(self) -> int:
+        """Queue system songs if the player is about to run dry. Returns how many were added."""
+        if not self.enabled or not check_time():
+            return 0
+        missing = self.manager.autofill_needed(self.lookahead)
+        if not missing:
+            return 0
+        self._refresh_playlist()
+        await self._refresh_weights()
+
+        added = 0
+        for _ in range(missing):
+            song = self.next_song()
+            if song is None:
+                break
+            self.manager.add_song(song, "system")
+            added += 1
+        self.added += added
+        return added
+
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "source": self.source,
+            "playlist_songs": len(self.playlist),
+            "lookahead": self.lookahead,
+            "added": self.added
+        }
+
+
+# Create a global instance for the application to use
+playlist_autofill = PlaylistAutofill(song_queue_manager)
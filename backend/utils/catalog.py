@@ -0,0 +1,186 @@
+
+import os
+import re
+import json
+import bisect
+import difflib
+import threading
+from dataclasses import dataclass, field
+
+from backend.utils.fseq_index import fseq_index
+
+
+SONGS_FILE = 'songs.json'
+
+_WORD = re.compile(r"[\w']+")
+
+
+@dataclass(frozen=True)
+class _CatalogIndex:
+    songs: dict[str, str] = field(default_factory=dict)   # name -> fseq, sorted by name
+    names: list[str] = field(default_factory=list)
+    folded: list[tuple[str, str]] = field(default_factory=list)  # (casefolded name, name), sorted
+    words: dict[str, list[str]] = field(default_factory=dict)    # word -> names containing it
+    vocabulary: list[str] = field(default_factory=list)         # sorted words
+
+
+def _build_index(data: dict[str, str]) -> _CatalogIndex:
+    songs = dict(sorted(data.items()))
+    words: dict[str, list[str]] = {}
+    for name in songs:
+        for word in set(_WORD.findall(name.casefold())):
+            words.setdefault(word, []).append(name)
+    return _CatalogIndex(
+        songs=songs,
+        names=list(songs),
+        folded=sorted((name.casefold(), name) for name in songs),
+        words=words,
+        vocabulary=sorted(words)
+    )
+
+
+class SongCatalog:
+    """
+    In-memory index of songs.json (song name -> fseq file).
+    The file is re-parsed only when its mtime or size changes; lookups are
+    dict hits and searches use sorted indexes, so callers can hit it freely.
+    """
+
+    def __init__(self, path: str = SONGS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.version = 0
+        self._stamp: tuple[int, int] | None = None
+        self._index = _CatalogIndex()
+
+
+    def refresh(self) -> _CatalogIndex:
+        """Reload the file if it changed and return the current index."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            if self._stamp is None:
+                print(f"[CATALOG] Failed to read {self.path}: {e}")
+            return self._index
+
+        if stamp != self._stamp:
+            with self.lock:
+                if stamp != self._stamp:
+                    self._load(stamp)
+        return self._index
+
+
+    def _load(self, stamp: tuple[int, int]):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Keep serving the previous catalog while the file is mid-edit
+            print(f"[CATALOG] Failed to load {self.path}: {e}")
+            return
+        self._index = _build_index(data)
+        self._stamp = stamp
+        self.version += 1
+        print(f"[CATALOG] Loaded {len(self._index.songs)} songs from {self.path}")
+
+
+    @property
+    def etag(self) -> str:
+        self.refresh()
+        mtime_ns, size = self._stamp or (0, 0)
+        # Song pages carry durations, so a rescanned fseq index changes it too
+        return f'"c-{mtime_ns}-{size}-{fseq_index.version}"'
+
+
+    @property
+    def songs(self) -> dict[str, str]:
+        """All songs sorted by name. Treat as read-only."""
+        return self.refresh().songs
+
+
+    def __len__(self) -> int:
+        return len(self.refresh().songs)
+
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.refresh().songs
+
+
+    def get(self, name: str) -> str | None:
+        """Return the fseq file for a song name, or None if unknown."""
+        return self.refresh().songs.get(name)
+
+
+    def duration(self, name: str) -> float | None:
+        """Song length in seconds from its FSEQ header, if indexed."""
+        song_file = self.get(name)
+        return fseq_index.duration(song_file) if song_file else None
+
+
+    def durations(self, names) -> dict[str, float | None]:
+        return {name: self.duration(name) for name in names}
+
+
+    def page(self, offset: int = 0, limit: int = 50) -> dict[str, str]:
+        """Return a slice of the sorted catalog."""
+        index = self.refresh()
+        names = index.names[offset:offset + limit]
+        return {name: index.songs[name] for name in names}
+
+
+    def search(self, query: str, limit: int = 20) -> dict[str, str]:
+        """
+        Find songs by name prefix, then by word prefix, then by close
+        spelling of each word. Results keep that order of relevance.
+        """
+        index = self.refresh()
+        query = query.casefold().strip()
+        if not query or limit <= 0:
+            return {}
+
+        found: dict[str, None] = {}
+
+        # Whole-name prefix
+        i = bisect.bisect_left(index.folded, (query,))
+        while i < len(index.folded) and index.folded[i][0].startswith(query):
+            found[index.folded[i][1]] = None
+            if len(found) >= limit:
+                return {name: index.songs[name] for name in found}
+            i += 1
+
+        terms = _WORD.findall(query)
+        if not terms:
+            return {name: index.songs[name] for name in found}
+
+        # Every term must prefix-match a word of the name
+        candidates = None
+        for term in terms:
+            matches = set(self._words_with_prefix(index, term))
+            candidates = matches if candidates is None else candidates & matches
+        for name in sorted(candidates):
+            found[name] = None
+            if len(found) >= limit:
+                return {name: index.songs[name] for name in found}
+
+        # Fuzzy fallback on the word vocabulary for typos
+        for term in terms:
+            for word in difflib.get_close_matches(term, index.vocabulary, n=5, cutoff=0.75):
+                for name in index.words[word]:
+                    found[name] = None
+                    if len(found) >= limit:
+                        return {name: index.songs[name] for name in found}
+
+        return {name: index.songs[name] for name in found}
+
+
+    @staticmethod
+    def _words_with_prefix(index: _CatalogIndex, prefix: str):
+        i = bisect.bisect_left(index.vocabulary, prefix)
+        while i < len(index.vocabulary) and index.vocabulary[i].startswith(prefix):
+            yield from index.words[index.vocabulary[i]]
+            i += 1
+
+
+# Create a global instance for the application to use
+song_catalog = SongCatalog()
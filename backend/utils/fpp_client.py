@@ -0,0 +1,140 @@
+
+import os
+import time
+import httpx
+from dataclasses import dataclass, field
+from urllib.parse import quote
+
+from backend.utils.metrics import fpp_request_seconds, fpp_errors
+
+
+FPP_IP = os.getenv('FPP_IP')
+FPP_UID = os.getenv('FPP_UID')
+FPP_PWD = os.getenv('FPP_PWD')
+
+# Seconds; FPP sits on the local network, so anything slower is a fault
+FPP_TIMEOUT = float(os.getenv('FPP_TIMEOUT', '5'))
+FPP_CONNECT_TIMEOUT = float(os.getenv('FPP_CONNECT_TIMEOUT', '2'))
+
+
+class FPPError(Exception):
+    """Raised when the Falcon Player cannot be reached or rejects a call."""
+
+
+@dataclass
+class FPPStatus:
+    playlist: str
+    status_name: str
+    seconds_played: float | None = None
+    seconds_remaining: float | None = None
+    volume: int | None = None
+    raw: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def busy(self) -> bool:
+        return self.playlist != ""
+
+    @classmethod
+    def from_json(cls, data: dict) -> "FPPStatus":
+        def number(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+
+        volume = number(data.get('volume'))
+        return cls(
+            playlist=(data.get('current_playlist') or {}).get('playlist', ""),
+            status_name=data.get('status_name', ""),
+            seconds_played=number(data.get('seconds_played')),
+            seconds_remaining=number(data.get('seconds_remaining')),
+            volume=int(volume) if volume is not None else None,
+            raw=data
+        )
+
+
+class FPPClient:
+    """
+    Async client for the Falcon Player HTTP API.
+    One pooled httpx.AsyncClient is shared by the player and the admin
+    routes, so calls reuse keep-alive connections and never block the loop.
+    """
+
+    def __init__(self, host: str | None, username: str | None, password: str | None,
+                 timeout: float = FPP_TIMEOUT):
+        self.host = host
+        self.auth = (username, password) if username else None
+        self.timeout = httpx.Timeout(timeout, connect=FPP_CONNECT_TIMEOUT)
+        self._client: httpx.AsyncClient | None = None
+
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=f"http://{self.host}",
+                auth=self.auth,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+            )
+        return self._client
+
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+    async def _get(self, path: str, timeout: float | None = None, endpoint: str | None = None) -> httpx.Response:
+        """GET `path`; `endpoint` names the call in metrics without its variable parts."""
+        endpoint = endpoint or path
+        start = time.perf_counter()
+        try:
+            response = await self._http().get(
+                path,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+            )
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            fpp_errors.inc(endpoint)
+            raise FPPError(f"FPP request {path} failed: {e}") from e
+        finally:
+            fpp_request_seconds.observe(time.perf_counter() - start, endpoint)
+
+
+    async def status(self, timeout: float | None = None) -> FPPStatus:
+        response = await self._get('/api/fppd/status', timeout)
+        return FPPStatus.from_json(response.json())
+
+
+    async def is_busy(self) -> bool:
+        return (await self.status()).busy
+
+
+    async def start_playlist(self, name: str):
+        """Start a playlist, or a single sequence when name ends in .fseq."""
+        await self._get(f'/api/playlist/{quote(name, safe="")}/start', endpoint='/api/playlist/start')
+
+
+    async def stop_playlists(self):
+        await self._get('/api/playlists/stop')
+
+
+    async def command(self, name: str, *args):
+        """Run an FPP command, e.g. command("FSEQ Effect Stop", "lights_on")."""
+        parts = [quote(str(part), safe="") for part in (name, *args)]
+        await self._get('/api/command/' + '/'.join(parts), endpoint=f'/api/command/{name}')
+
+
+    async def get_volume(self) -> int:
+        response = await self._get('/api/system/volume')
+        return int(response.json().get('volume', 0))
+
+
+    async def set_volume(self, level: int):
+        await self.command("Volume Set", max(0, min(int(level), 100)))
+
+
+# Create a global instance for the application to use
+fpp_client = FPPClient(FPP_IP, FPP_UID, FPP_PWD)
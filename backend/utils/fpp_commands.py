@@ -1,62 +1,98 @@
 
-import time
+import asyncio
 import os
-import requests
+
+from backend.utils.fpp_client import fpp_client
+from backend.utils.tracing import play_tracer
 
 
-FPP_IP = os.getenv('FPP_IP')
-FPP_UID = os.getenv('FPP_UID')
-FPP_PWD = os.getenv('FPP_PWD')
 IS_DEV = os.getenv('IS_DEV', '1') == '1'
 
+# Seconds between end-of-song checks while a sequence plays
+BUSY_POLL_SECONDS = 2
+# Start checking for the end this long before a known duration runs out
+END_CHECK_MARGIN_SECONDS = 3
+
+# Created per song and set by stop_song() so a waiting player wakes at once
+_stopped: asyncio.Event | None = None
+
+
+async def _wait_or_stopped(stopped: asyncio.Event, seconds: float) -> bool:
+    """Sleep up to `seconds`. Returns True if stop_song() cut it short."""
+    try:
+        await asyncio.wait_for(stopped.wait(), max(seconds, 0))
+        return True
+    except asyncio.TimeoutError:
+        return False
 
-def play_song(song_file):
+
+async def play_song(song_file, duration: float | None = None):
+    """
+    Play a sequence and return once FPP reports it finished.
+    With a known duration, sleep through most of the song instead of polling.
+    Each stage is timed by play_tracer when the player has a trace open.
+    Returns early once stop_song() is called.
+    """
+    global _stopped
     print("Playing:", song_file)
+    _stopped = stopped_event = asyncio.Event()
     if IS_DEV:
-        time.sleep(15)  # Simulate song duration
+        with play_tracer.stage("play", dev=True):
+            await _wait_or_stopped(stopped_event, duration or 15)  # Simulate song duration
         return
-    lights_off()
-    time.sleep(1)
-    url = f'http://{FPP_IP}/api/playlist/{song_file}.fseq/start'
-    requests.get(url, auth=(FPP_UID, FPP_PWD))
-    while is_busy():
-        time.sleep(2)
-    lights_on()
-
-
-def is_busy():
-    url = f'http://{FPP_IP}/api/fppd/status'
-    response = requests.get(url, auth=(FPP_UID, FPP_PWD))
-    if response.json()['current_playlist']['playlist'] != "":
-        return True
-    return False
+    with play_tracer.stage("lights_off"):
+        await lights_off()
+    with play_tracer.stage("settle"):
+        await asyncio.sleep(1)
+    with play_tracer.stage("start"):
+        await fpp_client.start_playlist(f'{song_file}.fseq')
+    done = False
+    if duration:
+        loop = asyncio.get_running_loop()
+        expected_end = loop.time() + duration
+        with play_tracer.stage("play", expected_seconds=duration):
+            done = await _wait_or_stopped(stopped_event, duration - END_CHECK_MARGIN_SECONDS)
+            # Sequences can finish a little early, so poll through the margin
+            while not done and loop.time() < expected_end:
+                done = not await is_busy() or await _wait_or_stopped(
+                    stopped_event, min(BUSY_POLL_SECONDS, expected_end - loop.time())
+                )
+    # Only time past the expected end counts as detecting the end;
+    # without a known duration the whole song is spent polling here
+    with play_tracer.stage("detect_end" if duration else "play", poll_seconds=BUSY_POLL_SECONDS):
+        while not done and await is_busy():
+            done = await _wait_or_stopped(stopped_event, BUSY_POLL_SECONDS)
+    with play_tracer.stage("lights_on"):
+        await lights_on()
+
+
+async def is_busy():
+    return await fpp_client.is_busy()
 
 
-def stop_song():
+async def stop_song():
+    if _stopped is not None:
+        _stopped.set()
     if IS_DEV:
         print("Stopping song (dev mode)")
         return
-    url = f'http://{FPP_IP}/api/playlists/stop'
-    requests.get(url, auth=(FPP_UID, FPP_PWD))
+    await fpp_client.stop_playlists()
 
 
-def lights_on():
+async def lights_on():
     if IS_DEV:
         print("Lights ON (dev mode)")
         return
-    # url = f'http://{FPP_IP}/api/command/Start%20Playlist/lights_on/true/true'
-    url = f'http://{FPP_IP}/api/command/FSEQ%20Effect%20Start/lights_on/true/true'
-    requests.get(url, auth=(FPP_UID, FPP_PWD))
+    # await fpp_client.command("Start Playlist", "lights_on", "true", "true")
+    await fpp_client.command("FSEQ Effect Start", "lights_on", "true", "true")
 
 
-def lights_off():
+async def lights_off():
     if IS_DEV:
         print("Lights OFF (dev mode)")
         return
-    url = f'http://{FPP_IP}/api/command/FSEQ%20Effect%20Stop/lights_on'
-    requests.get(url, auth=(FPP_UID, FPP_PWD))
+    await fpp_client.command("FSEQ Effect Stop", "lights_on")
 
 
-# def start_fans():
-#     url = f'http://{FPP_IP}/api/command/FSEQ%20Effect%20Start/fans_on/true/true'
-#     requests.get(url, auth=(FPP_UID, FPP_PWD))
+# async def start_fans():
+#     await fpp_client.command("FSEQ Effect Start", "fans_on", "true", "true")
@@ -0,0 +1,192 @@
+
+import os
+import json
+import mmap
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+
+
+FSEQ_DIR = os.getenv('FSEQ_DIR')
+FSEQ_INDEX_FILE = os.getenv('FSEQ_INDEX_FILE', 'fseq_index.json')
+
+# Libraries at least this large are parsed across a process pool
+PARALLEL_THRESHOLD = 64
+
+# Fixed header fields shared by FSEQ v1 and v2 (little endian):
+# magic, channel data offset, minor, major, header length,
+# channels per frame, frame count, step time (ms), flags
+_HEADER = struct.Struct('<4sHBBHIIBB')
+_MAGICS = (b'PSEQ', b'FSEQ')
+_COMPRESSION = {0: "none", 1: "zstd", 2: "zlib"}
+
+
+@dataclass
+class FSeqInfo:
+    path: str
+    size: int
+    mtime_ns: int
+    version: str
+    channel_count: int
+    frame_count: int
+    step_ms: int
+    compression: str
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.frame_count * self.step_ms / 1000
+
+    @property
+    def frame_rate(self) -> float:
+        return 1000 / self.step_ms if self.step_ms else 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def parse_fseq_header(path: str) -> FSeqInfo:
+    """
+    Read an FSEQ v1/v2 header through mmap; only the first page is touched.
+    Raises ValueError for files that are not FSEQ sequences.
+    """
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size < _HEADER.size + 1:
+            raise ValueError(f"{path} is too small to be an FSEQ file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, _, minor, major, _, channels, frames, step_ms, _ = _HEADER.unpack_from(mm, 0)
+            compression = "none"
+            if major >= 2:
+                compression = _COMPRESSION.get(mm[20] & 0x0F, "unknown")
+
+    if magic not in _MAGICS:
+        raise ValueError(f"{path} is not an FSEQ file")
+    return FSeqInfo(
+        path=path,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        version=f"{major}.{minor}",
+        channel_count=channels,
+        frame_count=frames,
+        step_ms=step_ms,
+        compression=compression
+    )
+
+
+def _parse_or_none(path: str) -> FSeqInfo | None:
+    try:
+        return parse_fseq_header(path)
+    except (OSError, ValueError) as e:
+        print(f"[FSEQ] Skipping {path}: {e}")
+        return None
+
+
+class FSeqIndex:
+    """
+    Header index of a directory of .fseq files, persisted to a JSON file.
+    Entries are keyed by path and reused while size and mtime are unchanged,
+    so a rescan only parses new or modified sequences.
+    """
+
+    def __init__(self, sequence_dir: str | None = FSEQ_DIR, index_file: str = FSEQ_INDEX_FILE):
+        self.sequence_dir = sequence_dir
+        self.index_file = index_file
+        self.lock = threading.Lock()
+        self._by_path: dict[str, FSeqInfo] = {}
+        self._by_name: dict[str, FSeqInfo] = {}
+        self._loaded = False
+        # Bumped whenever the indexed sequences change
+        self.version = 0
+
+
+    def _load_cache(self):
+        try:
+            with open(self.index_file) as f:
+                entries = json.load(f)
+            self._set_entries({path: FSeqInfo(**data) for path, data in entries.items()})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            print(f"[FSEQ] Ignoring unreadable index {self.index_file}: {e}")
+        self._loaded = True
+
+
+    def _save_cache(self):
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({path: info.to_dict() for path, info in self._by_path.items()}, f)
+        os.replace(tmp_path, self.index_file)
+
+
+    def _set_entries(self, entries: dict[str, FSeqInfo]):
+        self._by_path = entries
+        self._by_name = {
+            os.path.splitext(os.path.basename(path))[0]: info
+            for path, info in entries.items()
+        }
+        self.version += 1
+
+
+    def scan(self) -> dict:
+        """Bring the index up to date with the sequence directory."""
+        if not self.sequence_dir:
+            return {"indexed": 0, "parsed": 0, "removed": 0}
+
+        with self.lock:
+            if not self._loaded:
+                self._load_cache()
+
+            current: dict[str, FSeqInfo] = {}
+            stale: list[str] = []
+            try:
+                with os.scandir(self.sequence_dir) as entries:
+                    for entry in entries:
+                        if not entry.name.lower().endswith('.fseq') or not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                        cached = self._by_path.get(entry.path)
+                        if cached and cached.size == stat.st_size and cached.mtime_ns == stat.st_mtime_ns:
+                            current[entry.path] = cached
+                        else:
+                            stale.append(entry.path)
+            except OSError as e:
+                # Keep serving the cached index; the sequences may just be unmounted
+                print(f"[FSEQ] Cannot scan {self.sequence_dir}: {e}")
+                return {"indexed": len(self._by_path), "parsed": 0, "removed": 0, "error": str(e)}
+
+            if len(stale) >= PARALLEL_THRESHOLD:
+                with ProcessPoolExecutor() as pool:
+                    parsed = list(pool.map(_parse_or_none, stale, chunksize=16))
+            else:
+                parsed = [_parse_or_none(path) for path in stale]
+
+            for info in parsed:
+                if info is not None:
+                    current[info.path] = info
+
+            removed = len(set(self._by_path) - set(current))
+            if stale or removed:
+                self._set_entries(current)
+                self._save_cache()
+
+        print(f"[FSEQ] Indexed {len(current)} sequences ({len(stale)} parsed, {removed} removed)")
+        return {"indexed": len(current), "parsed": len(stale), "removed": removed}
+
+
+    def get(self, song_file: str) -> FSeqInfo | None:
+        """Look up a sequence by its songs.json value (file name without .fseq)."""
+        if not self._loaded and self.sequence_dir:
+            with self.lock:
+                if not self._loaded:
+                    self._load_cache()
+        return self._by_name.get(song_file)
+
+
+    def duration(self, song_file: str) -> float | None:
+        info = self.get(song_file)
+        return info.duration_seconds if info else None
+
+
+# Create a global instance for the application to use
+fseq_index = FSeqIndex()
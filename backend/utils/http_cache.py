@@ -0,0 +1,50 @@
+
+import os
+import secrets
+from fastapi import Request, Response
+
+# Versions restart from zero with the process, so tag every ETag with a
+# per-boot token to keep a pre-restart ETag from matching new content
+BOOT_ID = secrets.token_hex(4)
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from version parts."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def file_etag(path: str) -> str | None:
+    """ETag derived from a file's mtime and size, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return make_etag("f", stat.st_mtime_ns, stat.st_size)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Empty 304 response carrying the validators."""
+    return Response(
+        status_code=304,
+        headers=cache_headers(etag, cache_control)
+    )
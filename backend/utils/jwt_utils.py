@@ -1,7 +1,10 @@
 import jwt
 import os
+import time
 import secrets
+import threading
 import bcrypt
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 
@@ -13,6 +16,69 @@ if not JWT_SECRET:
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 60
+# Verified access tokens kept in memory; admin pages reuse one token for 15 minutes
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "256"))
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens that already passed signature checks,
+    mapped to their claims. Each entry is dropped once the token's exp passes.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, tuple[float, Dict[str, str]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, token: str) -> Optional[Dict[str, str]]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self.entries[token]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return dict(claims)
+
+
+    def put(self, token: str, expires_at: float, claims: Dict[str, str]):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[token] = (expires_at, claims)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Create a global instance for the application to use
+token_cache = VerifiedTokenCache()
 
 
 def create_access_token(email: str, name: str) -> str:
@@ -36,14 +102,21 @@ def create_access_token(email: str, name: str) -> str:
 def verify_access_token(token: str) -> Optional[Dict[str, str]]:
     """
     Verify and decode JWT access token.
+    Tokens seen before are answered from token_cache until they expire.
     Returns: {"sub": email, "name": name} or None if invalid
     """
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return {
+        claims = {
             "email": payload.get("sub"),
             "name": payload.get("name")
         }
+        token_cache.put(token, payload["exp"], claims)
+        return dict(claims)
     except jwt.ExpiredSignatureError:
         raise ValueError("Token has expired")
     except jwt.InvalidTokenError as e:
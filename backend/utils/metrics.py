@@ -0,0 +1,260 @@
+
+import abc
+import bisect
+import threading
+import time
+from typing import Callable
+
+
+# Seconds; suits HTTP, FPP and other calls on the request path
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    """
+    Base for metrics rendered in the Prometheus text format.
+    Label values are passed positionally, in the order of `labels`.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+
+    @abc.abstractmethod
+    def _samples(self) -> list[str]:
+        """Sample lines in the text format, without HELP and TYPE."""
+
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple, float] = {}
+
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """Gauge set directly, or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple, float] = {}
+        self._collect: Callable[[], dict[tuple, float]] | None = None
+
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+    def collect_with(self, collect: Callable[[], dict[tuple, float]]):
+        """Read values from `collect()` ({label values: value}) on every scrape."""
+        self._collect = collect
+
+
+    def _samples(self) -> list[str]:
+        if self._collect is not None:
+            try:
+                values = list(self._collect().items())
+            except Exception as e:
+                print(f"[METRICS] Failed to collect {self.name}: {e}")
+                values = []
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; an observation is one bisect and three adds."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        bounds = [*self.buckets, float("inf")]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collects the app's metrics and renders them for /api/metrics."""
+
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request per route template.
+    Time is taken when the response starts, so long-lived streams (SSE,
+    NDJSON exports) are measured to their first byte, not their end.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_timed(message):
+            if message["type"] == "http.response.start":
+                # The router stores the matched route in the shared scope
+                route = scope.get("route")
+                http_request_seconds.observe(
+                    time.perf_counter() - start,
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    str(message["status"])
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+
+# Create a global instance for the application to use
+registry = MetricsRegistry()
+
+queue_depth = registry.gauge(
+    "lightshow_queue_depth", "Songs waiting in each queue.", ("queue",)
+)
+queue_wait_seconds = registry.histogram(
+    "lightshow_queue_wait_seconds", "Time from enqueue to play.", ("queue",),
+    buckets=(5, 15, 30, 60, 120, 300, 600, 900, 1800, 3600)
+)
+songs_played = registry.counter(
+    "lightshow_songs_played_total", "Songs started, by the queue they came from.", ("queue",)
+)
+song_play_seconds = registry.histogram(
+    "lightshow_song_play_seconds", "Time from starting a song on FPP to it finishing.", ("result",),
+    buckets=(30, 60, 120, 180, 240, 300, 420, 600, 900)
+)
+fpp_request_seconds = registry.histogram(
+    "lightshow_fpp_request_seconds", "Falcon Player API call latency.", ("endpoint",)
+)
+fpp_errors = registry.counter(
+    "lightshow_fpp_errors_total", "Falcon Player API calls that failed.", ("endpoint",)
+)
+redis_operation_seconds = registry.histogram(
+    "lightshow_redis_operation_seconds", "Redis helper latency.", ("op",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+redis_errors = registry.counter(
+    "lightshow_redis_errors_total", "Redis helpers that raised.", ("op",)
+)
+webhook_deliveries = registry.counter(
+    "lightshow_webhook_deliveries_total",
+    "N8N webhook outcomes (delivered, failed attempt, dropped).", ("kind", "result")
+)
+webhook_pending = registry.gauge(
+    "lightshow_webhook_pending", "N8N events queued, retrying or in flight."
+)
+rate_limited = registry.counter(
+    "lightshow_rate_limited_total", "Public requests refused by the rate limiter.", ("endpoint",)
+)
+play_stage_seconds = registry.histogram(
+    "lightshow_play_stage_seconds", "Time in each stage of playing a song (wait, lights_off, start, ...).", ("stage",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30, 60, 300)
+)
+http_request_seconds = registry.histogram(
+    "lightshow_http_request_seconds", "API latency to first response byte.", ("method", "route", "status")
+)
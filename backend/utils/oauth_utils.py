@@ -5,6 +5,8 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from google.auth import exceptions as google_exceptions
 import os
+import threading
+import httpx
 import requests
 import json
 
@@ -30,16 +32,101 @@ except Exception as e:
     WEB_CLIENT_ID = ""
     WEB_CLIENT_SECRET = ""
 
-ALLOWED_EMAILS = os.getenv("ALLOW_LIST", "").split(",")
-ALLOWED_EMAILS = [email.strip() for email in ALLOWED_EMAILS if email.strip()]
+GOOGLE_TOKEN_URI = CLIENT_SECRETS.get('web', {}).get('token_uri', 'https://oauth2.googleapis.com/token')
+GOOGLE_USERINFO_URI = 'https://www.googleapis.com/oauth2/v2/userinfo'
+GOOGLE_HTTP_TIMEOUT = float(os.getenv('GOOGLE_HTTP_TIMEOUT', '10'))
+
+_google_http: httpx.AsyncClient | None = None
+
+ALLOW_LIST = os.getenv("ALLOW_LIST", "")
+# Optional file of extra allowed emails (one per line or comma separated),
+# re-read whenever it changes so access can be granted without a restart
+ALLOW_LIST_FILE = os.getenv("ALLOW_LIST_FILE")
+
+
+def _parse_emails(raw: str) -> set[str]:
+    return {
+        email.strip().lower()
+        for line in raw.splitlines()
+        for email in line.split(",")
+        if email.strip() and not email.strip().startswith("#")
+    }
+
+
+class AllowList:
+    """
+    Allowed admin emails held as a frozenset for O(1) checks.
+    Built from ALLOW_LIST plus ALLOW_LIST_FILE; the file is reloaded when
+    its mtime or size changes. Only when neither is configured does an
+    empty list allow every user.
+    """
+
+    def __init__(self, raw: str = ALLOW_LIST, path: str | None = ALLOW_LIST_FILE):
+        self.raw = raw
+        self.path = path
+        self.lock = threading.Lock()
+        self.version = 0
+        self.emails: frozenset[str] = frozenset()
+        self._stamp: tuple[int, int] | None = None
+        self.reload()
+
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.path or _parse_emails(self.raw))
+
+
+    def _file_stamp(self) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+
+    def reload(self) -> frozenset[str]:
+        """
+        Rebuild the set from the environment value and the file.
+        If the file cannot be read the previous set is kept.
+        """
+        with self.lock:
+            emails = _parse_emails(self.raw)
+            if self.path:
+                self._stamp = self._file_stamp()
+                try:
+                    with open(self.path) as f:
+                        emails |= _parse_emails(f.read())
+                except OSError as e:
+                    # Keep the previous list rather than granting or revoking access by accident
+                    print(f"[AUTH] Failed to read {self.path}: {e}")
+                    if self.version:
+                        return self.emails
+            self.emails = frozenset(emails)
+            self.version += 1
+
+        if not self.emails:
+            if self.configured:
+                print("[AUTH] Warning: allow list is empty, denying all users")
+            else:
+                print("[AUTH] Warning: ALLOW_LIST is empty, allowing all users")
+        return self.emails
+
+
+    def allows(self, email: str) -> bool:
+        if self.path and self._file_stamp() != self._stamp:
+            self.reload()
+        if not self.emails:
+            return not self.configured
+        return email.lower() in self.emails
+
+
+# Create a global instance for the application to use
+allow_list = AllowList()
 
 
 def check_authorized_user(email: str) -> bool:
     """Check if user email is in the allow list."""
-    if not ALLOWED_EMAILS:
-        print("[AUTH] Warning: ALLOW_LIST is empty, allowing all users")
-        return True
-    return email in ALLOWED_EMAILS
+    return allow_list.allows(email)
 
 
 def create_oauth_flow():
@@ -65,22 +152,47 @@ def get_authorization_url() -> tuple[str, str]:
     return authorization_url, state
 
 
-def exchange_code_for_tokens_google(code: str) -> dict:
+def _google_client() -> httpx.AsyncClient:
+    """Pooled client for Google's OAuth endpoints, created on first use."""
+    global _google_http
+    if _google_http is None or _google_http.is_closed:
+        _google_http = httpx.AsyncClient(timeout=GOOGLE_HTTP_TIMEOUT)
+    return _google_http
+
+
+async def close_google_client():
+    global _google_http
+    if _google_http is not None:
+        await _google_http.aclose()
+        _google_http = None
+
+
+async def exchange_code_for_tokens_google(code: str) -> dict:
     """
     Exchange authorization code for Google user info.
+    Both the token exchange and the userinfo lookup are awaited, so a login
+    never blocks the event loop.
     Returns dict with: email, name, picture
     Raises: Exception on failure
     """
     try:
-        flow = create_oauth_flow()
-        flow.fetch_token(code=code)
+        http = _google_client()
+        response = await http.post(GOOGLE_TOKEN_URI, data={
+            'code': code,
+            'client_id': WEB_CLIENT_ID,
+            'client_secret': WEB_CLIENT_SECRET,
+            'redirect_uri': REDIRECT_URI,
+            'grant_type': 'authorization_code'
+        })
 
-        credentials = flow.credentials
+        if response.status_code != 200:
+            raise Exception(f"Failed to exchange code: {response.status_code}")
+
+        access_token = response.json()['access_token']
 
         # Get user info
-        userinfo_endpoint = 'https://www.googleapis.com/oauth2/v2/userinfo'
-        headers = {'Authorization': f'Bearer {credentials.token}'}
-        response = requests.get(userinfo_endpoint, headers=headers)
+        headers = {'Authorization': f'Bearer {access_token}'}
+        response = await http.get(GOOGLE_USERINFO_URI, headers=headers)
 
         if response.status_code != 200:
             raise Exception(f"Failed to get user info: {response.status_code}")
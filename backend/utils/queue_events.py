@@ -0,0 +1,64 @@
+
+import asyncio
+
+
+class QueueEvents:
+    """
+    Generation-based fan-out of queue change notifications to asyncio waiters.
+
+    Each notify() bumps `generation` and swaps in a fresh asyncio.Event after
+    setting the old one, waking everyone waiting on it at once. A waiter reads
+    `generation` before checking the state it cares about and passes it to
+    wait(), which returns immediately if a change landed in between, so no
+    notification is missed. Idle waiters share the one current Event, so
+    thousands of stream connections cost one object rather than one queue
+    each. notify() may be called from any thread; off-loop calls are handed
+    to the loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._event: asyncio.Event | None = None
+        self.generation = 0
+
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach to the event loop that serves the waiters."""
+        self._loop = loop
+        self._event = asyncio.Event()
+
+
+    def notify(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake()
+        else:
+            loop.call_soon_threadsafe(self._wake)
+
+
+    def _wake(self):
+        self.generation += 1
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+
+    async def wait(self, generation: int, timeout: float) -> bool:
+        """
+        Wait until the generation moves past `generation`.
+        Returns True on change, False if the timeout elapsed first.
+        """
+        if self._loop is None:
+            self.bind(asyncio.get_running_loop())
+        if self.generation != generation:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
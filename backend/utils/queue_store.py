@@ -0,0 +1,114 @@
+
+import os
+import json
+import time
+import asyncio
+
+from backend.utils.queueing import SongQueueManager, song_queue_manager
+from backend.utils.redis_client import get_redis_client, timed
+
+
+QUEUE_STATE_KEY = "queue_state"
+QUEUE_PERSIST = os.getenv('QUEUE_PERSIST', '1') == '1'
+# Longest wait between checks when nothing changes (keeps the task responsive to stop())
+IDLE_SAVE_CHECK_SECONDS = 30
+
+
+class QueueStore:
+    """
+    Keeps a copy of the queues in Redis so a restart resumes the show.
+    Every version change is saved by a background task that waits on the
+    manager's change events, so add_song and get_next_song never wait on
+    Redis; a burst of changes collapses into a single write of the latest state.
+    """
+
+    def __init__(self, manager: SongQueueManager, key: str = QUEUE_STATE_KEY):
+        self.manager = manager
+        self.key = key
+        self._task: asyncio.Task | None = None
+        self._saved_version: int | None = None
+        self._failing = False
+        self.saves = 0
+
+
+    async def restore(self) -> int:
+        """Load the saved queues into the manager. Call before the player starts."""
+        if not QUEUE_PERSIST:
+            return 0
+        start = time.perf_counter()
+        try:
+            with timed("queue_restore"):
+                raw = await get_redis_client().get(self.key)
+        except Exception as e:
+            print(f"[QUEUE] Could not load saved queues: {e}")
+            return 0
+        if not raw:
+            return 0
+
+        try:
+            restored = self.manager.restore_state(json.loads(raw))
+        except Exception as e:
+            # A corrupt or older-format state must not keep the show from starting
+            print(f"[QUEUE] Discarding unreadable saved queues: {e}")
+            self.manager.clear_queues()
+            await self._set_aside()
+            return 0
+        self._saved_version = None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"[QUEUE] Restored {restored} queued songs in {elapsed_ms:.1f} ms")
+        return restored
+
+
+    async def _set_aside(self):
+        """Rename the saved state to {key}:corrupt so it can be inspected but is not loaded again."""
+        try:
+            await get_redis_client().rename(self.key, f"{self.key}:corrupt")
+        except Exception as e:
+            print(f"[QUEUE] Could not set aside saved queues: {e}")
+
+
+    async def start(self):
+        if not QUEUE_PERSIST:
+            return
+        self._task = asyncio.create_task(self._saver(), name="queue-store")
+
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.save()
+
+
+    async def save(self):
+        state = self.manager.export_state()
+        if state["version"] == self._saved_version:
+            return
+        try:
+            with timed("queue_save"):
+                await get_redis_client().set(self.key, json.dumps(state, separators=(",", ":")))
+        except Exception as e:
+            if not self._failing:
+                print(f"[QUEUE] Failed to save queues: {e}")
+            self._failing = True
+            return
+        if self._failing:
+            print("[QUEUE] Saving queues again")
+        self._failing = False
+        self._saved_version = state["version"]
+        self.saves += 1
+
+
+    async def _saver(self):
+        while True:
+            await self.save()
+            if self._failing:
+                await asyncio.sleep(1)
+                continue
+            await self.manager.wait_for_change(self._saved_version, IDLE_SAVE_CHECK_SECONDS)
+
+
+# Create a global instance for the application to use
+queue_store = QueueStore(song_queue_manager)
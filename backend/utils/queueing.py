@@ -1,105 +1,390 @@
 
-import threading
-import json
+import os
 import time
-import datetime
-from backend.utils.fpp_commands import play_song
+import threading
+import asyncio
+import itertools
+from backend.utils.queue_events import QueueEvents
+from backend.utils.song_queue import (
+    BoundedSongQueue,
+    VotedSongQueue,
+    FairShareQueue,
+    RecentSongs,
+    QueueEntry,
+    QueueFullError,
+    RecentlyPlayedError,
+    RequesterLimitError
+)
+from backend.utils.schedule import show_schedule
+from backend.utils.metrics import queue_depth, queue_wait_seconds, songs_played
 
 
-start_time = datetime.time(17, 00)
-end_time = datetime.time(21, 0)
+def check_time():
+    return show_schedule.is_open()
 
 
-def get_song_list():
-    with open('songs.json') as f:
-        songs = json.load(f)
-    songs = dict(sorted(songs.items()))
-    return songs
 
+QUEUE_TYPES = ("admin", "requested", "system")  # In priority order
 
-def check_time():
-    current_time = datetime.datetime.now().time()
-    if start_time <= current_time <= end_time:
-        return True
-    else:
-        return False
+QUEUE_CAPACITY = {
+    "admin": int(os.getenv("ADMIN_QUEUE_MAX", "100")),
+    "requested": int(os.getenv("REQUESTED_QUEUE_MAX", "200")),
+    "system": int(os.getenv("SYSTEM_QUEUE_MAX", "100")),
+}
 
+# Public requests for any of the last N songs played are refused, and
+# autofill avoids them (0 disables). Admin-queued and restored entries are
+# not checked: an admin may deliberately replay a song.
+NO_REPEAT_WINDOW = int(os.getenv("NO_REPEAT_WINDOW", "5"))
+
+# "fair" serves requesters round-robin; "votes" plays the most-voted song first
+REQUEST_SCHEDULER = os.getenv("REQUEST_SCHEDULER", "fair")
+# Songs one client may have waiting (requested or voted for); 0 disables
+MAX_PENDING_PER_REQUESTER = int(os.getenv("MAX_PENDING_PER_REQUESTER", "3"))
 
 
 class SongQueueManager:
     def __init__(self):
         self.lock = threading.Lock()
-        self.admin_queue: list[str] = []
-        self.requested_queue: list[str] = []
-        self.system_queue: list[str] = []
+        self.queues: dict[str, BoundedSongQueue] = {
+            queue_type: BoundedSongQueue(queue_type, QUEUE_CAPACITY[queue_type])
+            for queue_type in QUEUE_TYPES
+        }
+        # Public requests for the same song share one entry and add votes
+        queue_class = FairShareQueue if REQUEST_SCHEDULER == "fair" else VotedSongQueue
+        self.queues["requested"] = queue_class("requested", QUEUE_CAPACITY["requested"])
+        self.admin_queue = self.queues["admin"]
+        self.requested_queue = self.queues["requested"]
+        self.system_queue = self.queues["system"]
         self.current_song: str | None = None
-        self.song_list = get_song_list()
+        # Entry popped for the song now playing, so a restart can replay it
+        self.playing_entry: QueueEntry | None = None
+        # Never cleared, unlike current_song, so the next pop can avoid repeating it
+        self.last_played: str | None = None
+        self.recent = RecentSongs(NO_REPEAT_WINDOW)
+        self.events = QueueEvents()
+        self.version = 0
+        self._entry_ids = itertools.count(1)
+
+
+    def _changed(self):
+        """Record a state change. Caller must hold self.lock."""
+        self.version += 1
+        self.events.notify()
+
 
+    def _queue(self, queue_type: str) -> BoundedSongQueue:
+        # Unknown types fall back to the requested queue, as before
+        return self.queues.get(queue_type, self.requested_queue)
 
-    def add_song(self, song: str, queue_type: str = "requested"):
+
+    def add_song(self, song: str, queue_type: str = "requested") -> QueueEntry:
+        """Append a song. Raises QueueFullError when the queue is at capacity."""
+        if isinstance(self._queue(queue_type), VotedSongQueue):
+            return self.request_song(song)[0]
+        with self.lock:
+            queue = self._queue(queue_type)
+            entry = QueueEntry(next(self._entry_ids), song, queue.queue_type)
+            queue.push(entry)
+            self._changed()
+            return entry
+
+
+    def request_song(self, song: str, voter: str | None = None) -> tuple[QueueEntry, bool]:
+        """
+        Queue a public request, or vote for the entry already holding it.
+        Returns (entry, counted); counted is False if this voter already voted.
+        Raises RecentlyPlayedError inside the no-repeat window (checked only
+        here and by autofill, not for admin songs),
+        RequesterLimitError when the voter has too many songs waiting and
+        QueueFullError when a new entry does not fit.
+        """
         with self.lock:
-            if queue_type == "admin":
-                self.admin_queue.append(song)
-            elif queue_type == "system":
-                self.system_queue.append(song)
+            queue = self.requested_queue
+            if song in self.recent:
+                raise RecentlyPlayedError(song, self.recent.window)
+            entry = queue.find(song)
+            if entry is not None and queue.has_voted(entry, voter):
+                return entry, False
+            if voter and MAX_PENDING_PER_REQUESTER and queue.pending_for(voter) >= MAX_PENDING_PER_REQUESTER:
+                raise RequesterLimitError(MAX_PENDING_PER_REQUESTER)
+            if entry is not None:
+                counted = queue.vote(entry, voter)
             else:
-                self.requested_queue.append(song)
+                entry = QueueEntry(next(self._entry_ids), song, queue.queue_type, requester=voter)
+                queue.push(entry, voter=voter)
+                counted = True
+                # The request plays it; a queued system copy would repeat it
+                for queued in [queued for queued in self.system_queue if queued.song == song]:
+                    self.system_queue.remove(queued.id)
+            if counted:
+                self._changed()
+            return entry, counted
+
+
+    def add_songs(self, songs: list[str], queue_type: str = "requested") -> list[QueueEntry]:
+        """
+        Append several songs under one lock acquisition.
+        All or nothing: raises QueueFullError if they do not all fit.
+        """
+        with self.lock:
+            queue = self._queue(queue_type)
+            if isinstance(queue, VotedSongQueue):
+                raise ValueError("Batches cannot be added to the requested queue")
+            if len(songs) > queue.free_slots:
+                raise QueueFullError(queue.queue_type, queue.capacity)
+            entries = [QueueEntry(next(self._entry_ids), song, queue.queue_type) for song in songs]
+            for entry in entries:
+                queue.push(entry)
+            if entries:
+                self._changed()
+            return entries
 
 
     def get_next_song(self) -> str | None:
-        next_song = None
-        with self.lock:
-            if self.admin_queue:
-                return self.admin_queue.pop(0)
-            elif self.requested_queue:
-                next_song = self.requested_queue.pop(0)
-            elif self.system_queue:
-                next_song = self.system_queue.pop(0)
-            if next_song and check_time():
-                return next_song
+        """
+        Pop the next song in priority order.
+        Admin songs bypass the show window; requested and system songs stay
+        queued while the show is closed instead of being dropped.
+        """
+        with self.lock:
+            entry = self.admin_queue.pop()
+            if entry is None and check_time():
+                entry = self.requested_queue.pop() or self._pop_system()
+            if entry is None:
+                return None
+            self.playing_entry = entry
+            self.last_played = entry.song
+            self.recent.add(entry.song)
+            self._changed()
+        queue_wait_seconds.observe(time.time() - entry.enqueued_at, entry.queue_type)
+        songs_played.inc(entry.queue_type)
+        return entry.song
+
+
+    def _pop_system(self) -> QueueEntry | None:
+        """
+        Pop the next system song, dropping any that would play the same song
+        twice in a row. Caller must hold self.lock.
+        """
+        while (entry := self.system_queue.pop()) is not None:
+            if entry.song != self.last_played:
+                return entry
+            print(f"[QUEUE] Dropped system song '{entry.song}': it just played")
+        return None
+
+
+    def position(self, entry_id: int) -> int | None:
+        """1-based place of a requested entry in play order, or None once it left the queue."""
+        with self.lock:
+            for index, entry in enumerate(self.requested_queue.entries(), start=1):
+                if entry.id == entry_id:
+                    return index
             return None
 
 
-    def peek_queues(self, queue_type: str | None = None):
+    def queue_depths(self) -> dict[tuple, int]:
+        """Songs waiting per queue type, for the queue depth gauge."""
+        return {(queue_type,): len(queue) for queue_type, queue in self.queues.items()}
+
+
+    def has_pending(self) -> bool:
+        """True if any queue holds a song."""
         with self.lock:
-            if queue_type == "admin":
-                return self.admin_queue.copy()
-            elif queue_type == "requested":
-                return self.requested_queue.copy()
-            elif queue_type == "system":
-                return self.system_queue.copy()
+            return any(len(queue) for queue in self.queues.values())
+
+
+    def autofill_needed(self, lookahead: int) -> int:
+        """
+        How many system songs to add so `lookahead` are ready.
+        Zero while admin or requested songs are waiting.
+        """
+        with self.lock:
+            if len(self.admin_queue) or len(self.requested_queue):
+                return 0
+            return max(lookahead - len(self.system_queue), 0)
+
+
+    def can_autofill(self, song: str, allow_recent: bool = False) -> bool:
+        """False if the song is playing or just played, played recently, or already queued."""
+        with self.lock:
+            if song in (self.current_song, self.last_played) or (song in self.recent and not allow_recent):
+                return False
+            if self.requested_queue.find(song) is not None:
+                return False
+            return song not in self.system_queue.songs()
+
+
+    def remove_entry(self, entry_id: int) -> QueueEntry | None:
+        """Remove a queued entry by id from whichever queue holds it."""
+        with self.lock:
+            for queue in self.queues.values():
+                entry = queue.remove(entry_id)
+                if entry is not None:
+                    self._changed()
+                    return entry
             return None
 
 
-    def set_current_song(self, song: str):
+    def move_entry(self, entry_id: int, to_front: bool) -> bool:
+        """Move a queued entry to the front or back of its queue."""
+        with self.lock:
+            for queue in self.queues.values():
+                if queue.move(entry_id, to_front):
+                    self._changed()
+                    return True
+            return False
+
+
+    def peek_queues(self, queue_type: str | None = None):
+        with self.lock:
+            queue = self.queues.get(queue_type)
+            if queue is None:
+                return None
+            return queue.songs()
+
+
+    def peek_entries(self) -> dict[str, list[dict]]:
+        """Every queued entry, with ids, grouped by queue type."""
+        with self.lock:
+            return {
+                queue_type: [entry.to_dict() for entry in queue]
+                for queue_type, queue in self.queues.items()
+            }
+
+
+    def snapshot(self) -> dict:
+        """Copy of every queue and the current song, taken under one lock."""
         with self.lock:
+            requested = self.requested_queue.entries()
+            return {
+                "version": self.version,
+                "admin_queue": self.admin_queue.songs(),
+                "requested_queue": [entry.song for entry in requested],
+                "requested_votes": [entry.votes for entry in requested],
+                "scheduler": self.requested_queue.scheduler_info(),
+                "system_queue": self.system_queue.songs(),
+                "current_song": self.current_song
+            }
+
+
+    def set_current_song(self, song: str | None):
+        with self.lock:
+            changed = self.current_song != song
+            if song is None and self.playing_entry is not None:
+                # Saved state must stop listing it as playing
+                self.playing_entry = None
+                changed = True
+            if not changed:
+                return
             self.current_song = song
+            self._changed()
 
 
     def get_current_song(self) -> str | None:
         with self.lock:
             return self.current_song
-        
+
+
+    def clear_queue(self, queue_type: str) -> int:
+        """Clear one queue and return how many songs were removed."""
+        with self.lock:
+            count = self.queues[queue_type].clear()
+            self._changed()
+            return count
+
 
     def clear_queues(self):
         with self.lock:
-            self.admin_queue.clear()
-            self.requested_queue.clear()
-            self.system_queue.clear()
+            for queue in self.queues.values():
+                queue.clear()
+            self._changed()
 
 
-    def loop_songs(self):
-        songs = get_song_list()
+    def export_state(self) -> dict:
+        """Everything needed to rebuild the queues after a restart."""
+        with self.lock:
+            return {
+                "version": self.version,
+                "queues": {
+                    queue_type: [entry.to_dict() for entry in queue]
+                    for queue_type, queue in self.queues.items()
+                },
+                "playing": self.playing_entry.to_dict() if self.playing_entry else None,
+                "recent": self.recent.songs()
+            }
+
+
+    def restore_state(self, state: dict) -> int:
+        """
+        Rebuild the queues from export_state() output, keeping entry ids.
+        A song that was playing goes back to the front of its queue.
+        Returns how many entries were restored.
+        """
+        with self.lock:
+            restored = 0
+            max_id = 0
+            playing = state.get("playing")
+            for queue_type, entries in state.get("queues", {}).items():
+                queue = self.queues.get(queue_type)
+                if queue is None:
+                    continue
+                for data in entries:
+                    entry = QueueEntry.from_dict(data)
+                    max_id = max(max_id, entry.id)
+                    if entry.id in queue:
+                        continue
+                    voted = isinstance(queue, VotedSongQueue)
+                    # States saved before coalescing may hold the same song twice
+                    existing = queue.find(entry.song) if voted else None
+                    if existing is not None:
+                        queue.vote(existing, count=entry.votes)
+                        continue
+                    try:
+                        if voted:
+                            queue.push(entry, voter=entry.requester)
+                        else:
+                            queue.push(entry)
+                        restored += 1
+                    except QueueFullError:
+                        print(f"[QUEUE] Dropped '{entry.song}' on restore: {queue_type} queue is full")
+            if playing:
+                entry = QueueEntry.from_dict(playing)
+                max_id = max(max_id, entry.id)
+                queue = self.queues.get(entry.queue_type)
+                if queue is not None and entry.id not in queue:
+                    try:
+                        queue.push(entry, front=True)
+                        restored += 1
+                    except QueueFullError:
+                        print(f"[QUEUE] Could not requeue interrupted song '{entry.song}'")
+            for song in state.get("recent", []):
+                self.recent.add(song)
+            self._entry_ids = itertools.count(max(max_id + 1, next(self._entry_ids)))
+            self.version = max(self.version, state.get("version", 0))
+            self._changed()
+            return restored
+
+
+    async def wait_for_change(self, since: int, timeout: float) -> bool:
+        """
+        Wait until the version moves past `since`.
+        Returns True on change, False if the timeout elapsed first.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
         while True:
-            next_song = self.get_next_song()
-            if next_song:
-                self.set_current_song(next_song)
-                song_file = songs[next_song]
-                play_song(song_file)
-                self.set_current_song(None)
-            else:
-                time.sleep(2)
+            # Read the generation before the version so a change that lands in
+            # between still wakes the wait below
+            generation = self.events.generation
+            if self.version != since:
+                return True
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await self.events.wait(generation, remaining)
 
 
 # Create a global instance for the application to use
-song_queue_manager = SongQueueManager()
\ No newline at end of file
+song_queue_manager = SongQueueManager()
+queue_depth.collect_with(song_queue_manager.queue_depths)
\ No newline at end of file
@@ -0,0 +1,190 @@
+
+import os
+import math
+import time
+from collections import OrderedDict, Counter
+from dataclasses import dataclass
+
+from backend.utils.redis_client import get_redis_client, timed
+from backend.utils.metrics import rate_limited
+
+
+# "memory" keeps buckets in this process; "redis" shares them across workers
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+# Clients behind one address (one household, one NAT) share a bucket this
+# many times larger than a single device's, which also caps cookie clearing
+RATE_LIMIT_SHARED_IP_FACTOR = int(os.getenv('RATE_LIMIT_SHARED_IP_FACTOR', '3'))
+MAX_TRACKED_BUCKETS = 50000
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket: `capacity` requests, refilled evenly over `per_seconds`."""
+    capacity: int
+    per_seconds: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.per_seconds
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimit | None":
+        """Parse "5/300" (5 requests per 300 s). "0" or "" disables the limit."""
+        if not spec or spec.strip() == "0":
+            return None
+        count, _, seconds = spec.partition("/")
+        return cls(int(count), float(seconds or 60))
+
+    def scaled(self, factor: int) -> "RateLimit":
+        return RateLimit(self.capacity * factor, self.per_seconds)
+
+
+RATE_LIMITS: dict[str, RateLimit | None] = {
+    "song_request": RateLimit.parse(os.getenv('RATE_LIMIT_SONG_REQUEST', '5/300')),
+    "custom_request": RateLimit.parse(os.getenv('RATE_LIMIT_CUSTOM_REQUEST', '3/3600')),
+}
+
+# KEYS: bucket keys; ARGV: now (ms), then capacity and refill-per-ms for each key.
+# A request is allowed only if every bucket has a token; then each loses one.
+# Returns the wait in ms before a retry could succeed ("0" when allowed).
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local data = redis.call('HMGET', key, 't', 'ts')
+    local current = tonumber(data[1]) or capacity
+    local updated = tonumber(data[2]) or now
+    current = math.min(capacity, current + math.max(now - updated, 0) * rate)
+    if current < 1 then wait = math.max(wait, (1 - current) / rate) end
+    tokens[i] = current
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local current = tokens[i]
+    if wait == 0 then current = current - 1 end
+    redis.call('HSET', key, 't', tostring(current), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate))
+end
+return tostring(wait)
+"""
+
+
+class MemoryBuckets:
+    """
+    Token buckets in a bounded LRU. Only touched from the event loop, so no
+    lock is needed; a check is a dict lookup and a little arithmetic.
+    """
+
+    def __init__(self, max_keys: int = MAX_TRACKED_BUCKETS):
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+
+    def take(self, checks: list[tuple[str, RateLimit]], now: float) -> float:
+        """Take one token from every bucket, or none. Returns seconds to wait (0 if allowed)."""
+        wait = 0.0
+        levels = []
+        for key, limit in checks:
+            tokens, updated = self.buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + max(now - updated, 0) * limit.refill_per_second)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / limit.refill_per_second)
+            levels.append(tokens)
+
+        for (key, _), tokens in zip(checks, levels):
+            self.buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class RateLimiter:
+    """
+    Per-client token buckets for the public endpoints.
+    Each request draws from a per-device bucket (address + device cookie)
+    and a larger shared bucket for the address. The Redis backend falls
+    back to this process' buckets if Redis is unreachable.
+    """
+
+    def __init__(self, limits: dict[str, RateLimit | None] = RATE_LIMITS, backend: str = RATE_LIMIT_BACKEND):
+        self.limits = limits
+        self.backend = backend
+        self.memory = MemoryBuckets()
+        self.allowed: Counter = Counter()
+        self.limited: Counter = Counter()
+        self._script = None
+        self._redis_failing = False
+
+
+    def _checks(self, name: str, client_id: str, device_id: str | None) -> list[tuple[str, RateLimit]]:
+        limit = self.limits.get(name)
+        if limit is None:
+            return []
+        return [
+            (f"ratelimit:{name}:{client_id}:{device_id or '-'}", limit),
+            (f"ratelimit:{name}:{client_id}", limit.scaled(RATE_LIMIT_SHARED_IP_FACTOR)),
+        ]
+
+
+    async def check(self, name: str, client_id: str, device_id: str | None = None) -> float:
+        """Consume a request for this client. Returns seconds to wait, 0 when allowed."""
+        checks = self._checks(name, client_id, device_id)
+        if not checks:
+            return 0.0
+
+        if self.backend == "redis":
+            wait = await self._take_redis(checks)
+        else:
+            wait = self.memory.take(checks, time.monotonic())
+
+        if wait:
+            self.limited[name] += 1
+            rate_limited.inc(name)
+        else:
+            self.allowed[name] += 1
+        return wait
+
+
+    async def _take_redis(self, checks: list[tuple[str, RateLimit]]) -> float:
+        args = [int(time.time() * 1000)]
+        for _, limit in checks:
+            args += [limit.capacity, limit.refill_per_second / 1000]
+        try:
+            client = get_redis_client()
+            if self._script is None:
+                self._script = client.register_script(_TOKEN_BUCKET_LUA)
+            with timed("rate_limit"):
+                wait_ms = await self._script(keys=[key for key, _ in checks], args=args, client=client)
+        except Exception as e:
+            if not self._redis_failing:
+                print(f"[RATE LIMIT] Redis unavailable, limiting per process: {e}")
+            self._redis_failing = True
+            return self.memory.take(checks, time.monotonic())
+        self._redis_failing = False
+        return float(wait_ms) / 1000
+
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "limits": {
+                name: {"capacity": limit.capacity, "per_seconds": limit.per_seconds} if limit else None
+                for name, limit in self.limits.items()
+            },
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "tracked_buckets": len(self.memory.buckets)
+        }
+
+
+def retry_after(wait_seconds: float) -> str:
+    return str(max(math.ceil(wait_seconds), 1))
+
+
+# Create a global instance for the application to use
+rate_limiter = RateLimiter()
@@ -1,114 +1,513 @@
-import redis
+import redis.asyncio as redis
 import os
+import time
+import threading
+from contextlib import contextmanager
+from redis.commands.core import AsyncScript
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
+from backend.utils.metrics import redis_operation_seconds, redis_errors
+
 # Redis connection
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "20"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+# Oldest sessions beyond this many per user are evicted (0 = unlimited)
+MAX_SESSIONS_PER_USER = int(os.getenv("MAX_SESSIONS_PER_USER", "10"))
+SESSION_INDEX_READY_KEY = "user_sessions:backfilled"
+TOKEN_HASHES_READY_KEY = "refresh_token_format:hash"
+# A rotated token presented again within this window is a concurrent refresh
+# (e.g. two tabs), not reuse, and is rotated again instead of revoking everything
+ROTATION_GRACE_SECONDS = int(os.getenv("ROTATION_GRACE_SECONDS", "10"))
+# How long after the grace window a rotated token is kept so a replay is caught
+# as reuse; afterwards it is simply unknown (expired)
+REUSE_DETECTION_SECONDS = int(os.getenv("REUSE_DETECTION_SECONDS", str(24 * 60 * 60)))
+
+# Refresh rotation outcomes
+ROTATED = "rotated"
+REUSE_DETECTED = "reuse"
+EXPIRED = "expired"
+
+# Converts a legacy JSON-string token record into a hash in place, keeping its TTL
+_MIGRATE_LUA_FN = """
+local function migrate(key)
+    if redis.call('TYPE', key)['ok'] ~= 'string' then return end
+    local ok, data = pcall(cjson.decode, redis.call('GET', key))
+    local ttl = redis.call('TTL', key)
+    redis.call('DEL', key)
+    if not ok or type(data) ~= 'table' or type(data['user_email']) ~= 'string' then return end
+    local fields = {'user_email', data['user_email'], 'revoked', data['revoked'] == true and '1' or '0'}
+    for _, name in ipairs({'created_at', 'last_used_at', 'rotated_at'}) do
+        local value = data[name]
+        if type(value) == 'string' or type(value) == 'number' then
+            table.insert(fields, name)
+            table.insert(fields, tostring(value))
+        end
+    end
+    redis.call('HSET', key, unpack(fields))
+    if ttl > 0 then redis.call('EXPIRE', key, ttl) end
+end
+"""
+
+# KEYS: token key
+_MIGRATE_LUA = _MIGRATE_LUA_FN + """
+migrate(KEYS[1])
+return redis.call('TYPE', KEYS[1])['ok']
+"""
+
+# KEYS: token key; ARGV: field, value, ...
+# Only touches existing records so a late update never recreates a token without a TTL
+_UPDATE_FIELDS_LUA = _MIGRATE_LUA_FN + """
+migrate(KEYS[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+# KEYS: token key; ARGV: token hash
+_REVOKE_LUA = _MIGRATE_LUA_FN + """
+migrate(KEYS[1])
+local email = redis.call('HGET', KEYS[1], 'user_email')
+redis.call('DEL', KEYS[1])
+if email then redis.call('ZREM', 'user_sessions:' .. email, ARGV[1]) end
+return email and 1 or 0
+"""
+
+# KEYS: old token key, new token key
+# ARGV: old hash, new hash, new ttl, now (epoch), now (iso), grace seconds, max sessions,
+#       reuse detection seconds
+# Session index keys are derived from the stored email, so this assumes a
+# single Redis node (no cluster slot routing).
+_ROTATE_LUA = _MIGRATE_LUA_FN + """
+migrate(KEYS[1])
+local email = redis.call('HGET', KEYS[1], 'user_email')
+if not email then return {'expired', ''} end
+
+local sessions = 'user_sessions:' .. email
+local now = tonumber(ARGV[4])
+
+if redis.call('HGET', KEYS[1], 'revoked') == '1' then
+    local rotated_at = tonumber(redis.call('HGET', KEYS[1], 'rotated_at') or 0)
+    if rotated_at == 0 or now - rotated_at > tonumber(ARGV[6]) then
+        local hashes = redis.call('ZRANGE', sessions, 0, -1)
+        for _, token_hash in ipairs(hashes) do
+            redis.call('DEL', 'refresh_token:' .. token_hash)
+        end
+        redis.call('DEL', sessions)
+        return {'reuse', email}
+    end
+else
+    redis.call('HSET', KEYS[1], 'revoked', '1', 'rotated_at', ARGV[4])
+    redis.call('ZREM', sessions, ARGV[1])
+    -- Out of the session index, so only keep it as long as reuse detection needs
+    local keep = tonumber(ARGV[6]) + tonumber(ARGV[8])
+    local remaining = redis.call('TTL', KEYS[1])
+    if remaining < 0 or remaining > keep then redis.call('EXPIRE', KEYS[1], keep) end
+end
+
+local ttl = tonumber(ARGV[3])
+redis.call('HSET', KEYS[2], 'user_email', email, 'created_at', ARGV[5], 'last_used_at', ARGV[5], 'revoked', '0')
+redis.call('EXPIRE', KEYS[2], ttl)
+redis.call('ZADD', sessions, now + ttl, ARGV[2])
+redis.call('ZREMRANGEBYSCORE', sessions, '-inf', now)
+redis.call('EXPIRE', sessions, ttl)
+
+local max_sessions = tonumber(ARGV[7])
+local count = redis.call('ZCARD', sessions)
+if max_sessions > 0 and count > max_sessions then
+    local oldest = redis.call('ZRANGE', sessions, 0, count - max_sessions - 1)
+    for _, token_hash in ipairs(oldest) do
+        redis.call('DEL', 'refresh_token:' .. token_hash)
+        redis.call('ZREM', sessions, token_hash)
+    end
+end
+return {'rotated', email}
+"""
+_scripts: dict[str, AsyncScript] = {}
+
+
+@dataclass
+class RefreshTokenRecord:
+    """
+    A refresh token as stored in the refresh_token:{hash} Redis hash.
+    Small hashes use Redis' compact listpack encoding, and single fields
+    can be changed with HSET without touching the TTL.
+    """
+    user_email: str
+    created_at: str
+    last_used_at: str
+    revoked: bool = False
+    rotated_at: Optional[float] = None
+
+    @classmethod
+    def new(cls, user_email: str) -> "RefreshTokenRecord":
+        now = datetime.utcnow().isoformat()
+        return cls(user_email=user_email, created_at=now, last_used_at=now)
+
+    @classmethod
+    def from_hash(cls, fields: dict) -> "RefreshTokenRecord":
+        rotated_at = fields.get("rotated_at")
+        return cls(
+            user_email=fields.get("user_email", ""),
+            created_at=fields.get("created_at", ""),
+            last_used_at=fields.get("last_used_at", ""),
+            revoked=fields.get("revoked") == "1",
+            rotated_at=float(rotated_at) if rotated_at else None
+        )
+
+    def to_hash(self) -> dict:
+        fields = {
+            "user_email": self.user_email,
+            "created_at": self.created_at,
+            "last_used_at": self.last_used_at,
+            "revoked": "1" if self.revoked else "0"
+        }
+        if self.rotated_at is not None:
+            fields["rotated_at"] = str(self.rotated_at)
+        return fields
+
+_pool: Optional[redis.ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def init_redis_pool() -> redis.ConnectionPool:
+    """Create the process-wide connection pool (safe to call more than once)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = redis.ConnectionPool.from_url(
+                REDIS_URL,
+                decode_responses=True,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                health_check_interval=30
+            )
+            print(f"[REDIS] Connection pool ready (max {REDIS_MAX_CONNECTIONS} connections)")
+    return _pool
+
+
+async def close_redis_pool() -> None:
+    """Disconnect every pooled connection."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        await pool.aclose()
+
 
 def get_redis_client() -> redis.Redis:
-    """Get Redis client instance."""
-    return redis.from_url(REDIS_URL, decode_responses=True)
+    """Get a Redis client backed by the shared connection pool."""
+    return redis.Redis(connection_pool=_pool or init_redis_pool())
+
+
+class RedisStats:
+    """Per-operation call counts and latency, for spotting slow round trips."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ops: dict[str, dict] = {}
+
+
+    def record(self, op: str, seconds: float, failed: bool = False):
+        with self.lock:
+            stats = self.ops.setdefault(op, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += failed
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                op: {
+                    **stats,
+                    "avg_ms": round(stats["total_seconds"] / stats["calls"] * 1000, 3) if stats["calls"] else 0.0,
+                    "max_ms": round(stats["max_seconds"] * 1000, 3)
+                }
+                for op, stats in self.ops.items()
+            }
+
+
+    def reset(self):
+        with self.lock:
+            self.ops.clear()
+
+
+# Create a global instance for the application to use
+redis_stats = RedisStats()
+
+
+@contextmanager
+def timed(op: str):
+    """Record how long the wrapped Redis operation takes under `op`."""
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        redis_stats.record(op, elapsed, failed)
+        redis_operation_seconds.observe(elapsed, op)
+        if failed:
+            redis_errors.inc(op)
+
+
+def _token_key(token_hash: str) -> str:
+    return f"refresh_token:{token_hash}"
+
+
+def _sessions_key(user_email: str) -> str:
+    """Sorted set of a user's token hashes, scored by expiry (epoch seconds)."""
+    return f"user_sessions:{user_email}"
+
+
+async def _run_script(client: redis.Redis, source: str, keys: list, args: list):
+    """Run a Lua script by SHA, loading it on first use."""
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = client.register_script(source)
+    return await script(keys=keys, args=args, client=client)
+
+
+def _index_session(pipe, user_email: str, token_hash: str, expires_in_seconds: int) -> None:
+    """Queue the index update for a new token, pruning expired entries on the way."""
+    now = time.time()
+    key = _sessions_key(user_email)
+    pipe.zadd(key, {token_hash: now + expires_in_seconds})
+    pipe.zremrangebyscore(key, "-inf", now)
+    pipe.expire(key, expires_in_seconds)
+    pipe.zcard(key)
+
+
+async def _enforce_session_cap(client: redis.Redis, user_email: str, count: int) -> None:
+    """Evict the user's oldest sessions beyond MAX_SESSIONS_PER_USER."""
+    if not MAX_SESSIONS_PER_USER or count <= MAX_SESSIONS_PER_USER:
+        return
+    key = _sessions_key(user_email)
+    oldest = await client.zrange(key, 0, count - MAX_SESSIONS_PER_USER - 1)
+    if oldest:
+        pipe = client.pipeline(transaction=True)
+        pipe.delete(*[_token_key(token_hash) for token_hash in oldest])
+        pipe.zrem(key, *oldest)
+        await pipe.execute()
+        print(f"[AUTH] Evicted {len(oldest)} old sessions for {user_email}")
+
+
+async def _set_token_fields(op: str, token_hash: str, fields: dict) -> bool:
+    """HSET fields on an existing token record; the TTL is left alone."""
+    client = get_redis_client()
+    args = [item for pair in fields.items() for item in pair]
+
+    with timed(op):
+        return bool(await _run_script(client, _UPDATE_FIELDS_LUA, [_token_key(token_hash)], args))
 
 # Refresh token storage helpers
-def store_refresh_token(token_hash: str, user_email: str, expires_in_seconds: int) -> None:
+async def store_refresh_token(token_hash: str, user_email: str, expires_in_seconds: int) -> None:
     """
     Store refresh token hash in Redis.
     Key format: refresh_token:{token_hash}
-    Value: JSON with user_email, created_at, last_used_at
+    Value: hash of RefreshTokenRecord fields (user_email, created_at, last_used_at, revoked)
+    The hash is also added to the user's session index (user_sessions:{email}).
     """
     client = get_redis_client()
-    import json
-    from datetime import datetime
-
-    data = {
-        "user_email": user_email,
-        "created_at": datetime.utcnow().isoformat(),
-        "last_used_at": datetime.utcnow().isoformat(),
-        "revoked": False
-    }
-
-    client.setex(
-        f"refresh_token:{token_hash}",
-        expires_in_seconds,
-        json.dumps(data)
-    )
+    key = _token_key(token_hash)
+
+    with timed("store_refresh_token"):
+        pipe = client.pipeline(transaction=True)
+        pipe.hset(key, mapping=RefreshTokenRecord.new(user_email).to_hash())
+        pipe.expire(key, expires_in_seconds)
+        _index_session(pipe, user_email, token_hash, expires_in_seconds)
+        count = (await pipe.execute())[-1]
+        await _enforce_session_cap(client, user_email, count)
+
+async def rotate_refresh_token(old_token_hash: str, new_token_hash: str, expires_in_seconds: int) -> tuple[str, Optional[str]]:
+    """
+    Check, rotate and store in one atomic server-side step.
+    The old token is kept, marked revoked, for ROTATION_GRACE_SECONDS plus
+    REUSE_DETECTION_SECONDS so a replay in that time is caught.
+    Returns (outcome, user_email): ROTATED, REUSE_DETECTED (every session
+    of the user was revoked) or EXPIRED (unknown token; email is None).
+    """
+    client = get_redis_client()
+
+    with timed("rotate_refresh_token"):
+        outcome, user_email = await _run_script(
+            client,
+            _ROTATE_LUA,
+            [_token_key(old_token_hash), _token_key(new_token_hash)],
+            [
+                old_token_hash,
+                new_token_hash,
+                expires_in_seconds,
+                time.time(),
+                datetime.utcnow().isoformat(),
+                ROTATION_GRACE_SECONDS,
+                MAX_SESSIONS_PER_USER,
+                REUSE_DETECTION_SECONDS
+            ]
+        )
+    return outcome, user_email or None
 
-def get_refresh_token_data(token_hash: str) -> Optional[dict]:
+async def get_refresh_token_data(token_hash: str) -> Optional[RefreshTokenRecord]:
     """Get refresh token data from Redis."""
     client = get_redis_client()
-    import json
+    key = _token_key(token_hash)
 
-    data = client.get(f"refresh_token:{token_hash}")
-    if data:
-        return json.loads(data)
+    with timed("get_refresh_token_data"):
+        try:
+            fields = await client.hgetall(key)
+        except redis.ResponseError:
+            # Legacy JSON record: convert it, then read again
+            await _run_script(client, _MIGRATE_LUA, [key], [])
+            fields = await client.hgetall(key)
+    if fields:
+        return RefreshTokenRecord.from_hash(fields)
     return None
 
-def update_refresh_token_last_used(token_hash: str) -> None:
+async def update_refresh_token_last_used(token_hash: str) -> None:
     """Update last_used_at timestamp for refresh token."""
+    await _set_token_fields(
+        "update_refresh_token_last_used",
+        token_hash,
+        {"last_used_at": datetime.utcnow().isoformat()}
+    )
+
+async def revoke_refresh_token(token_hash: str) -> None:
+    """Revoke (delete) refresh token from Redis and drop it from the owner's index."""
     client = get_redis_client()
-    import json
-    from datetime import datetime
-
-    data = get_refresh_token_data(token_hash)
-    if data:
-        data["last_used_at"] = datetime.utcnow().isoformat()
-        ttl = client.ttl(f"refresh_token:{token_hash}")
-        if ttl > 0:
-            client.setex(
-                f"refresh_token:{token_hash}",
-                ttl,
-                json.dumps(data)
-            )
 
-def revoke_refresh_token(token_hash: str) -> None:
-    """Revoke (delete) refresh token from Redis."""
+    with timed("revoke_refresh_token"):
+        await _run_script(client, _REVOKE_LUA, [_token_key(token_hash)], [token_hash])
+
+async def revoke_all_user_tokens(user_email: str) -> int:
+    """
+    Revoke all refresh tokens for a user using their session index.
+    Costs O(sessions of that user); returns how many were indexed.
+    """
     client = get_redis_client()
-    client.delete(f"refresh_token:{token_hash}")
+    key = _sessions_key(user_email)
 
-def revoke_all_user_tokens(user_email: str) -> None:
+    with timed("revoke_all_user_tokens"):
+        token_hashes = await client.zrange(key, 0, -1)
+        pipe = client.pipeline(transaction=True)
+        if token_hashes:
+            pipe.delete(*[_token_key(token_hash) for token_hash in token_hashes])
+        pipe.delete(key)
+        await pipe.execute()
+    return len(token_hashes)
+
+async def list_user_sessions(user_email: str) -> list[dict]:
     """
-    Revoke all refresh tokens for a user.
-    WARNING: This requires scanning all keys, use sparingly.
+    List a user's live sessions, newest first.
+    Expired or missing tokens are pruned from the index as they are found.
     """
     client = get_redis_client()
-    import json
+    key = _sessions_key(user_email)
 
-    cursor = 0
-    while True:
-        cursor, keys = client.scan(cursor, match="refresh_token:*", count=100)
+    with timed("list_user_sessions"):
+        pipe = client.pipeline(transaction=False)
+        pipe.zremrangebyscore(key, "-inf", time.time())
+        pipe.zrevrange(key, 0, -1, withscores=True)
+        _, entries = await pipe.execute()
+        if not entries:
+            return []
 
-        for key in keys:
-            data = client.get(key)
-            if data:
-                token_data = json.loads(data)
-                if token_data.get("user_email") == user_email:
-                    client.delete(key)
+        pipe = client.pipeline(transaction=False)
+        for token_hash, _ in entries:
+            pipe.hgetall(_token_key(token_hash))
+        values = await pipe.execute()
 
-        if cursor == 0:
-            break
+        sessions = []
+        missing = []
+        for (token_hash, expires_at), fields in zip(entries, values):
+            if not fields:
+                missing.append(token_hash)
+                continue
+            record = RefreshTokenRecord.from_hash(fields)
+            sessions.append({
+                "token_hash": token_hash,
+                "created_at": record.created_at,
+                "last_used_at": record.last_used_at,
+                "expires_at": datetime.utcfromtimestamp(expires_at).isoformat(),
+                "revoked": record.revoked
+            })
+        if missing:
+            await client.zrem(key, *missing)
+    return sessions
 
-def mark_token_as_revoked(token_hash: str) -> None:
+async def backfill_session_index() -> int:
     """
-    Mark token as revoked (for reuse detection).
-    Keep the token in Redis but mark it as revoked.
+    One-time SCAN that indexes refresh tokens stored before the session
+    index existed. Marks itself done so later startups skip the scan.
+    Run migrate_token_records first so every record is a hash.
     """
     client = get_redis_client()
-    import json
-
-    data = get_refresh_token_data(token_hash)
-    if data:
-        data["revoked"] = True
-        ttl = client.ttl(f"refresh_token:{token_hash}")
-        if ttl > 0:
-            client.setex(
-                f"refresh_token:{token_hash}",
-                ttl,
-                json.dumps(data)
-            )
+    if await client.exists(SESSION_INDEX_READY_KEY):
+        return 0
+
+    indexed = 0
+    with timed("backfill_session_index"):
+        cursor = 0
+        while True:
+            cursor, keys = await client.scan(cursor, match="refresh_token:*", count=100)
+            if keys:
+                pipe = client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.hget(key, "user_email")
+                    pipe.ttl(key)
+                results = await pipe.execute(raise_on_error=False)
+
+                now = time.time()
+                longest: dict[str, int] = {}
+                pipe = client.pipeline(transaction=False)
+                for key, user_email, ttl in zip(keys, results[::2], results[1::2]):
+                    if not isinstance(user_email, str) or ttl <= 0:
+                        continue
+                    if user_email:
+                        pipe.zadd(_sessions_key(user_email), {key.split(":", 1)[1]: now + ttl})
+                        longest[user_email] = max(longest.get(user_email, 0), ttl)
+                        indexed += 1
+                for user_email, ttl in longest.items():
+                    # Never shorten an index that already outlives this batch
+                    pipe.expire(_sessions_key(user_email), ttl, gt=True)
+                    pipe.expire(_sessions_key(user_email), ttl, nx=True)
+                await pipe.execute()
+
+            if cursor == 0:
+                break
+        await client.set(SESSION_INDEX_READY_KEY, 1)
+
+    print(f"[REDIS] Backfilled session index with {indexed} tokens")
+    return indexed
+
+async def migrate_token_records() -> int:
+    """
+    One-time SCAN that converts refresh tokens stored as JSON strings into
+    hashes, keeping their TTLs. Marks itself done so later startups skip it;
+    stragglers are still converted on first access.
+    """
+    client = get_redis_client()
+    if await client.exists(TOKEN_HASHES_READY_KEY):
+        return 0
+
+    migrated = 0
+    with timed("migrate_token_records"):
+        cursor = 0
+        while True:
+            cursor, keys = await client.scan(cursor, match="refresh_token:*", count=100, _type="string")
+            for key in keys:
+                await _run_script(client, _MIGRATE_LUA, [key], [])
+                migrated += 1
+            if cursor == 0:
+                break
+        await client.set(TOKEN_HASHES_READY_KEY, 1)
 
-def is_token_revoked(token_hash: str) -> bool:
-    """Check if token is marked as revoked."""
-    data = get_refresh_token_data(token_hash)
-    if data:
-        return data.get("revoked", False)
-    return True  # If token doesn't exist, consider it revoked
+    print(f"[REDIS] Migrated {migrated} refresh tokens to hashes")
+    return migrated
@@ -0,0 +1,148 @@
+
+import os
+import glob
+import gzip
+import json
+import shutil
+import asyncio
+import datetime as dt
+from typing import Iterator
+
+
+REQUEST_LOG_FILE = os.getenv('REQUEST_LOG_FILE', 'song_requests.jsonl')
+REQUEST_LOG_MAX_BYTES = int(os.getenv('REQUEST_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+# Records are buffered in memory and written at most this often
+REQUEST_LOG_FLUSH_SECONDS = float(os.getenv('REQUEST_LOG_FLUSH_SECONDS', '1'))
+REQUEST_LOG_BATCH_SIZE = 200
+REQUEST_LOG_BUFFER_MAX = 10000
+
+
+def segment_paths(path: str = REQUEST_LOG_FILE) -> list[str]:
+    """Rotated segments, oldest first, followed by the live file."""
+    base, ext = os.path.splitext(path)
+    segments = sorted(glob.glob(f"{glob.escape(base)}-*{ext}.gz"))
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+def read_request_log(path: str = REQUEST_LOG_FILE, since: dt.datetime | None = None) -> Iterator[dict]:
+    """
+    Stream records from every segment in time order without loading a
+    whole file. Lines that fail to parse (e.g. a torn final write) are skipped.
+    """
+    since_iso = since.isoformat() if since else None
+    for segment in segment_paths(path):
+        opener = gzip.open if segment.endswith('.gz') else open
+        try:
+            with opener(segment, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since_iso and record.get("ts", "") < since_iso:
+                        continue
+                    yield record
+        except OSError as e:
+            print(f"[REQUEST LOG] Failed to read {segment}: {e}")
+
+
+class RequestLog:
+    """
+    Structured JSONL log of public song requests.
+    log() only appends to an in-memory buffer; a background task writes
+    batches off the event loop, rotates the file by size or day and gzips
+    finished segments.
+    """
+
+    def __init__(self, path: str = REQUEST_LOG_FILE, max_bytes: int = REQUEST_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._buffer: list[str] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.written = 0
+        self.dropped = 0
+
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer(), name="request-log")
+
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self._flush()
+
+
+    def log(self, song: str, queue_type: str, client: str | None = None, position: int | None = None):
+        if len(self._buffer) >= REQUEST_LOG_BUFFER_MAX:
+            self.dropped += 1
+            return
+        record = {
+            "ts": dt.datetime.now().isoformat(timespec="milliseconds"),
+            "song": song,
+            "queue_type": queue_type,
+            "client": client,
+            "position": position
+        }
+        self._buffer.append(json.dumps(record, separators=(",", ":")) + "\n")
+        if len(self._buffer) >= REQUEST_LOG_BATCH_SIZE and self._wakeup is not None:
+            self._wakeup.set()
+
+
+    async def _writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), REQUEST_LOG_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, lines)
+            self.written += len(lines)
+        except OSError as e:
+            self.dropped += len(lines)
+            print(f"[REQUEST LOG] Failed to write {len(lines)} records: {e}")
+
+
+    def _write(self, lines: list[str]):
+        data = "".join(lines)
+        self._rotate_if_needed(len(data))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(data)
+
+
+    def _rotate_if_needed(self, incoming: int):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        started = dt.date.fromtimestamp(stat.st_mtime)
+        if stat.st_size + incoming <= self.max_bytes and started == dt.date.today():
+            return
+
+        base, ext = os.path.splitext(self.path)
+        stamp = dt.datetime.fromtimestamp(stat.st_mtime).strftime("%Y%m%d-%H%M%S")
+        rotated = f"{base}-{stamp}{ext}"
+        os.replace(self.path, rotated)
+        with open(rotated, 'rb') as src, gzip.open(f"{rotated}.gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        print(f"[REQUEST LOG] Rotated to {rotated}.gz")
+
+
+# Create a global instance for the application to use
+request_log = RequestLog()
@@ -0,0 +1,240 @@
+
+import os
+import json
+import bisect
+import datetime
+import threading
+from dataclasses import dataclass
+
+
+SCHEDULE_FILE = 'schedule.json'
+
+# How many days ahead the timeline is precomputed
+HORIZON_DAYS = 14
+
+# Used when schedule.json is missing or omits a field
+DEFAULT_CONFIG = {
+    "default": {
+        "start": "17:00",
+        "end": "21:00",
+        "lights_on": "17:00",
+        "lights_off": "23:00"
+    },
+    "dates": {},
+    "blackout": []
+}
+
+
+@dataclass(frozen=True)
+class DayPlan:
+    start: datetime.time | None
+    end: datetime.time | None
+    lights_on: datetime.time | None
+    lights_off: datetime.time | None
+
+
+def _parse_time(value: str | None) -> datetime.time | None:
+    return datetime.time.fromisoformat(value) if value else None
+
+
+def _format_time(value: datetime.time) -> str:
+    return value.strftime("%I:%M %p").lstrip("0")
+
+
+def _at(day: datetime.date, at: datetime.time) -> datetime.datetime:
+    return datetime.datetime.combine(day, at)
+
+
+class ShowSchedule:
+    """
+    Show windows and lights times from schedule.json.
+
+    schedule.json holds a "default" day ({start, end, lights_on, lights_off}
+    as HH:MM), per-date overrides under "dates" keyed by YYYY-MM-DD, and a
+    "blackout" list of dates with no show and no lights. A window whose end
+    is not after its start runs past midnight.
+
+    The next HORIZON_DAYS are expanded into a sorted timeline of windows, so
+    "is the show open" is a binary search rather than date arithmetic.
+    """
+
+    def __init__(self, path: str = SCHEDULE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self._stamp: tuple[int, int] | None = None
+        self._default = DayPlan(None, None, None, None)
+        self._dates: dict[datetime.date, DayPlan] = {}
+        self._blackout: set[datetime.date] = set()
+        self._built_for: datetime.date | None = None
+        self._starts: list[datetime.datetime] = []
+        self._ends: list[datetime.datetime] = []
+        self._lights: list[tuple[datetime.datetime, str]] = []
+        self._apply_config(DEFAULT_CONFIG)
+
+
+    def _apply_config(self, config: dict):
+        """Replace the schedule with `config`; on a malformed config nothing changes."""
+        if not isinstance(config, dict):
+            raise TypeError(f"expected an object, got {type(config).__name__}")
+        default = {**DEFAULT_CONFIG["default"], **config.get("default", {})}
+        plan = self._plan(default)
+        dates = {
+            datetime.date.fromisoformat(day): self._plan({**default, **overrides})
+            for day, overrides in config.get("dates", {}).items()
+        }
+        blackout = {
+            datetime.date.fromisoformat(day) for day in config.get("blackout", [])
+        }
+        self._default, self._dates, self._blackout = plan, dates, blackout
+        self._built_for = None
+
+
+    @staticmethod
+    def _plan(fields: dict) -> DayPlan:
+        return DayPlan(
+            start=_parse_time(fields.get("start")),
+            end=_parse_time(fields.get("end")),
+            lights_on=_parse_time(fields.get("lights_on")),
+            lights_off=_parse_time(fields.get("lights_off"))
+        )
+
+
+    def _refresh(self, now: datetime.datetime):
+        """Reload the config if it changed and rebuild the timeline once a day."""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+
+        if stamp != self._stamp or self._built_for != now.date():
+            with self.lock:
+                if stamp != self._stamp:
+                    self._load(stamp)
+                if self._built_for != now.date():
+                    self._build(now.date())
+
+
+    def _load(self, stamp: tuple[int, int] | None):
+        self._stamp = stamp
+        if stamp is None:
+            self._apply_config(DEFAULT_CONFIG)
+            return
+        try:
+            with open(self.path) as f:
+                self._apply_config(json.load(f))
+            print(f"[SCHEDULE] Loaded {self.path}")
+        except (OSError, ValueError, TypeError, AttributeError, KeyError) as e:
+            # Keep the previous schedule rather than opening or closing the show by accident
+            print(f"[SCHEDULE] Failed to load {self.path}: {e}")
+
+
+    def plan_for(self, day: datetime.date) -> DayPlan | None:
+        """The plan for a date, or None for a blackout date."""
+        if day in self._blackout:
+            return None
+        return self._dates.get(day, self._default)
+
+
+    def _build(self, today: datetime.date):
+        windows = []
+        lights = []
+        # Start a day back so a window running past midnight is still covered
+        for offset in range(-1, HORIZON_DAYS + 1):
+            day = today + datetime.timedelta(days=offset)
+            plan = self.plan_for(day)
+            if plan is None:
+                continue
+            if plan.start and plan.end:
+                start = _at(day, plan.start)
+                end = _at(day, plan.end)
+                if end <= start:
+                    end += datetime.timedelta(days=1)
+                windows.append((start, end))
+            if plan.lights_on:
+                lights.append((_at(day, plan.lights_on), "on"))
+            if plan.lights_off:
+                off = _at(day, plan.lights_off)
+                if plan.lights_on and plan.lights_off <= plan.lights_on:
+                    off += datetime.timedelta(days=1)
+                lights.append((off, "off"))
+
+        # Merge overlapping windows so the starts list stays strictly ordered
+        windows.sort()
+        merged: list[list[datetime.datetime]] = []
+        for start, end in windows:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+        self._lights = sorted(lights)
+        self._built_for = today
+
+
+    def current_window(self, now: datetime.datetime | None = None) -> tuple[datetime.datetime, datetime.datetime] | None:
+        """The (start, end) of the window containing now, if any."""
+        now = now or datetime.datetime.now()
+        self._refresh(now)
+        i = bisect.bisect_right(self._starts, now) - 1
+        if i >= 0 and now < self._ends[i]:
+            return self._starts[i], self._ends[i]
+        return None
+
+
+    def is_open(self, now: datetime.datetime | None = None) -> bool:
+        return self.current_window(now) is not None
+
+
+    def next_open(self, now: datetime.datetime | None = None) -> datetime.datetime | None:
+        """Now if the show is open, else the start of the next window."""
+        now = now or datetime.datetime.now()
+        if self.current_window(now):
+            return now
+        i = bisect.bisect_right(self._starts, now)
+        return self._starts[i] if i < len(self._starts) else None
+
+
+    def seconds_until_open(self, now: datetime.datetime | None = None) -> float | None:
+        """Seconds until the show opens (0 if open), or None if nothing is scheduled."""
+        now = now or datetime.datetime.now()
+        opens = self.next_open(now)
+        if opens is None:
+            return None
+        return max((opens - now).total_seconds(), 0.0)
+
+
+    def next_lights_event(self, now: datetime.datetime | None = None) -> tuple[datetime.datetime, str] | None:
+        """The next (time, "on" | "off") lights change after now."""
+        now = now or datetime.datetime.now()
+        self._refresh(now)
+        i = bisect.bisect_right(self._lights, (now, "~"))
+        return self._lights[i] if i < len(self._lights) else None
+
+
+    def describe_today(self, now: datetime.datetime | None = None) -> str | None:
+        """Human-readable show hours for today, e.g. '5:00 PM - 9:00 PM'."""
+        now = now or datetime.datetime.now()
+        self._refresh(now)
+        plan = self.plan_for(now.date())
+        if plan is None or not (plan.start and plan.end):
+            return None
+        return f"{_format_time(plan.start)} - {_format_time(plan.end)}"
+
+
+    def status(self, now: datetime.datetime | None = None) -> dict:
+        now = now or datetime.datetime.now()
+        window = self.current_window(now)
+        opens = self.next_open(now)
+        return {
+            "open": window is not None,
+            "hours_today": self.describe_today(now),
+            "closes_at": window[1].isoformat() if window else None,
+            "next_open": opens.isoformat() if opens and not window else None
+        }
+
+
+# Create a global instance for the application to use
+show_schedule = ShowSchedule()
@@ -0,0 +1,148 @@
+
+import time
+import asyncio
+import datetime
+
+from backend.utils.autofill import PlaylistAutofill, playlist_autofill
+from backend.utils.catalog import song_catalog
+from backend.utils.fseq_index import fseq_index
+from backend.utils.fpp_commands import play_song, lights_on, lights_off
+from backend.utils.metrics import song_play_seconds
+from backend.utils.tracing import play_tracer
+from backend.utils.queueing import SongQueueManager, song_queue_manager
+from backend.utils.schedule import ShowSchedule, show_schedule
+
+
+# Upper bound on an idle wait; queue changes wake the player immediately
+IDLE_RECHECK_SECONDS = 60
+# Upper bound on sleeping towards a schedule time, so edits to
+# schedule.json are picked up by a sleeping player or lights task
+SCHEDULE_RECHECK_SECONDS = 15 * 60
+# Pause after a failed song so an unreachable FPP is not hammered
+ERROR_BACKOFF_SECONDS = 5
+
+
+class ShowRuntime:
+    """
+    Runs the player and the daily lights jobs as tasks on the app's event loop.
+    The player sleeps on queue change notifications rather than polling, so a
+    request starts playing as soon as it is queued.
+    """
+
+    def __init__(self, manager: SongQueueManager, schedule: ShowSchedule, autofill: PlaylistAutofill):
+        self.manager = manager
+        self.schedule = schedule
+        self.autofill = autofill
+        self._tasks: list[asyncio.Task] = []
+
+
+    async def start(self):
+        self.manager.events.bind(asyncio.get_running_loop())
+        self._tasks = [
+            asyncio.create_task(self._player(), name="show-player"),
+            asyncio.create_task(self._lights(), name="show-lights"),
+            asyncio.create_task(self._index_sequences(), name="fseq-index"),
+        ]
+        print(f"[STARTUP] Show runtime started (show hours today: {self.schedule.describe_today()})")
+
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.manager.set_current_song(None)
+        print("[SHUTDOWN] Show runtime stopped")
+
+
+    async def _index_sequences(self):
+        """Scan the sequence directory for durations; the show runs without them on failure."""
+        try:
+            await asyncio.to_thread(fseq_index.scan)
+        except Exception as e:
+            print(f"[FSEQ] Sequence scan failed, song durations unavailable: {e}")
+
+
+    async def _player(self):
+        events = self.manager.events
+        while True:
+            # Take the generation first so an add racing the empty check wakes us
+            generation = events.generation
+            await self.autofill.top_up()
+            next_song = self.manager.get_next_song()
+            if next_song is None:
+                # Time spent idle is not dead air between songs
+                play_tracer.idle()
+                await events.wait(generation, self._idle_timeout())
+                continue
+
+            song_file = song_catalog.get(next_song)
+            if song_file is None:
+                print(f"[QUEUE] Skipping unknown song: {next_song}")
+                # It never played, so it must not be requeued after a restart
+                self.manager.set_current_song(None)
+                continue
+
+            self.manager.set_current_song(next_song)
+            # Have the next system song ready (and visible) while this one plays
+            await self.autofill.top_up()
+            started = time.monotonic()
+            trace = play_tracer.begin(next_song, song_file)
+            try:
+                await play_song(song_file, song_catalog.duration(next_song))
+                song_play_seconds.observe(time.monotonic() - started, "ok")
+                play_tracer.finish(trace)
+            except asyncio.CancelledError:
+                play_tracer.finish(trace, "error", "cancelled")
+                raise
+            except Exception as e:
+                song_play_seconds.observe(time.monotonic() - started, "error")
+                play_tracer.finish(trace, "error", str(e))
+                print(f"[PLAYER] Failed to play {next_song}: {e}")
+                await asyncio.sleep(ERROR_BACKOFF_SECONDS)
+            finally:
+                self.manager.set_current_song(None)
+
+
+    def _idle_timeout(self) -> float:
+        """
+        How long the player may sleep with nothing to play. Songs held back
+        by a closed show, and autofill, resume when the next window opens.
+        """
+        pending = self.manager.has_pending()
+        if not pending and not self.autofill.enabled:
+            return IDLE_RECHECK_SECONDS
+        until_open = self.schedule.seconds_until_open()
+        if until_open is None:
+            return SCHEDULE_RECHECK_SECONDS
+        if not pending and until_open == 0:
+            # Open, but autofill had nothing to add
+            return IDLE_RECHECK_SECONDS
+        return min(max(until_open, 0.1), SCHEDULE_RECHECK_SECONDS)
+
+
+    async def _lights(self):
+        actions = {"on": lights_on, "off": lights_off}
+        last_run = None
+        while True:
+            upcoming = self.schedule.next_lights_event()
+            if upcoming is None or upcoming[0] == last_run:
+                await asyncio.sleep(SCHEDULE_RECHECK_SECONDS if upcoming is None else 1)
+                continue
+
+            at, action = upcoming
+            delay = (at - datetime.datetime.now()).total_seconds()
+            if delay > SCHEDULE_RECHECK_SECONDS:
+                await asyncio.sleep(SCHEDULE_RECHECK_SECONDS)
+                continue
+
+            await asyncio.sleep(max(delay, 0))
+            last_run = at
+            try:
+                await actions[action]()
+            except Exception as e:
+                print(f"[SCHEDULER] Lights {action} failed: {e}")
+
+
+# Create a global instance for the application to use
+show_runtime = ShowRuntime(song_queue_manager, show_schedule, playlist_autofill)
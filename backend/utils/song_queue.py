@@ -0,0 +1,489 @@
+
+import time
+import heapq
+from collections import OrderedDict, Counter, deque
+from dataclasses import dataclass, field, fields, asdict
+
+
+class QueueFullError(Exception):
+    """Raised when a queue is at capacity."""
+
+    def __init__(self, queue_type: str, capacity: int):
+        self.queue_type = queue_type
+        self.capacity = capacity
+        super().__init__(f"The {queue_type} queue is full ({capacity} songs)")
+
+
+class RecentlyPlayedError(Exception):
+    """Raised when a request falls inside the no-repeat window."""
+
+    def __init__(self, song: str, window: int):
+        self.song = song
+        self.window = window
+        super().__init__(f"'{song}' was played within the last {window} songs")
+
+
+class RequesterLimitError(Exception):
+    """Raised when a requester already has the maximum number of songs waiting."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"Requester already has {limit} songs waiting")
+
+
+@dataclass
+class QueueEntry:
+    id: int
+    song: str
+    queue_type: str
+    enqueued_at: float = field(default_factory=time.time)
+    votes: int = 1
+    # Anonymous client id of whoever first requested the song
+    requester: str | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QueueEntry":
+        """Inverse of to_dict(); unknown keys from older or newer versions are ignored."""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+class BoundedSongQueue:
+    """
+    FIFO of QueueEntry items with a fixed capacity.
+    Backed by an OrderedDict keyed by entry id, so popping either end,
+    removing by id and moving an entry to the front or back are all O(1).
+    Not thread-safe; SongQueueManager serialises access with its lock.
+    """
+
+    def __init__(self, queue_type: str, capacity: int):
+        self.queue_type = queue_type
+        self.capacity = capacity
+        self._entries: OrderedDict[int, QueueEntry] = OrderedDict()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self._entries
+
+
+    @property
+    def free_slots(self) -> int:
+        return max(self.capacity - len(self._entries), 0)
+
+
+    def push(self, entry: QueueEntry, front: bool = False):
+        if len(self._entries) >= self.capacity:
+            raise QueueFullError(self.queue_type, self.capacity)
+        self._entries[entry.id] = entry
+        if front:
+            self._entries.move_to_end(entry.id, last=False)
+
+
+    def pop(self) -> QueueEntry | None:
+        """Remove and return the oldest entry."""
+        if not self._entries:
+            return None
+        return self._entries.popitem(last=False)[1]
+
+
+    def pop_back(self) -> QueueEntry | None:
+        """Remove and return the newest entry."""
+        if not self._entries:
+            return None
+        return self._entries.popitem(last=True)[1]
+
+
+    def peek(self) -> QueueEntry | None:
+        if not self._entries:
+            return None
+        return next(iter(self._entries.values()))
+
+
+    def remove(self, entry_id: int) -> QueueEntry | None:
+        return self._entries.pop(entry_id, None)
+
+
+    def move(self, entry_id: int, to_front: bool) -> bool:
+        """Move an entry to the front or back. Returns False if it is not queued."""
+        if entry_id not in self._entries:
+            return False
+        self._entries.move_to_end(entry_id, last=not to_front)
+        return True
+
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        return count
+
+
+    def songs(self) -> list[str]:
+        return [entry.song for entry in self._entries.values()]
+
+
+    def entries(self) -> list[QueueEntry]:
+        return list(self._entries.values())
+
+
+def _reversed(rank: tuple[int, int, int]) -> tuple[int, int, int]:
+    return (-rank[0], -rank[1], -rank[2])
+
+
+class VotedSongQueue(BoundedSongQueue):
+    """
+    Queue that coalesces duplicate songs into one entry with a vote count.
+    A song -> entry index makes a repeat request an O(1) vote, and a heap
+    ordered by (pin, -votes, id) gives the most-voted, then oldest, entry;
+    a mirrored heap gives the lowest ranked one for pop_back(). Heap items
+    go stale when an entry is voted, moved or removed; they are skipped on
+    pop and compacted when they pile up.
+    """
+
+    def __init__(self, queue_type: str, capacity: int):
+        super().__init__(queue_type, capacity)
+        self._by_song: dict[str, int] = {}
+        self._rank: dict[int, tuple[int, int, int]] = {}
+        self._heap: list[tuple[tuple[int, int, int], int]] = []
+        # Same ranks negated, so the lowest ranked entry is on top
+        self._back_heap: list[tuple[tuple[int, int, int], int]] = []
+        self._voters: dict[int, set[str]] = {}
+        # Queued entries each voter has requested or voted for
+        self._pending: Counter = Counter()
+        # Pins from move(): below zero sorts ahead of every vote count, above after
+        self._pins = 0
+        self._back_pins = 0
+
+
+    def __iter__(self):
+        return iter(self.entries())
+
+
+    def _set_rank(self, entry: QueueEntry, pin: int = 0):
+        rank = (pin, -entry.votes, entry.id)
+        self._rank[entry.id] = rank
+        heapq.heappush(self._heap, (rank, entry.id))
+        heapq.heappush(self._back_heap, (_reversed(rank), entry.id))
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [(rank, entry_id) for entry_id, rank in self._rank.items()]
+            heapq.heapify(self._heap)
+        if len(self._back_heap) > 2 * len(self._entries) + 16:
+            self._back_heap = [(_reversed(rank), entry_id) for entry_id, rank in self._rank.items()]
+            heapq.heapify(self._back_heap)
+
+
+    def _discard(self, entry: QueueEntry):
+        self._by_song.pop(entry.song, None)
+        self._rank.pop(entry.id, None)
+        for voter in self._voters.pop(entry.id, ()):
+            self._pending[voter] -= 1
+            if self._pending[voter] <= 0:
+                del self._pending[voter]
+
+
+    def find(self, song: str) -> QueueEntry | None:
+        entry_id = self._by_song.get(song)
+        return self._entries.get(entry_id) if entry_id is not None else None
+
+
+    def pending_for(self, voter: str) -> int:
+        return self._pending[voter]
+
+
+    def has_voted(self, entry: QueueEntry, voter: str | None) -> bool:
+        return bool(voter) and voter in self._voters.get(entry.id, ())
+
+
+    def push(self, entry: QueueEntry, front: bool = False, voter: str | None = None):
+        super().push(entry, front)
+        self._by_song[entry.song] = entry.id
+        self._voters[entry.id] = {voter} if voter else set()
+        if voter:
+            self._pending[voter] += 1
+        if front:
+            self._pins -= 1
+        self._set_rank(entry, self._pins if front else 0)
+
+
+    def vote(self, entry: QueueEntry, voter: str | None = None, count: int = 1) -> bool:
+        """Add votes to a queued entry. Returns False if this voter already voted."""
+        voters = self._voters.setdefault(entry.id, set())
+        if voter:
+            if voter in voters:
+                return False
+            voters.add(voter)
+            self._pending[voter] += 1
+        entry.votes += count
+        self._set_rank(entry, self._rank[entry.id][0])
+        return True
+
+
+    def pop(self) -> QueueEntry | None:
+        """Remove and return the highest ranked entry."""
+        while self._heap:
+            rank, entry_id = heapq.heappop(self._heap)
+            if self._rank.get(entry_id) != rank:
+                continue
+            entry = self._entries.pop(entry_id)
+            self._discard(entry)
+            return entry
+        return None
+
+
+    def pop_back(self) -> QueueEntry | None:
+        """Remove and return the lowest ranked entry."""
+        while self._back_heap:
+            reversed_rank, entry_id = heapq.heappop(self._back_heap)
+            if self._rank.get(entry_id) == _reversed(reversed_rank):
+                return self.remove(entry_id)
+        return None
+
+
+    def peek(self) -> QueueEntry | None:
+        while self._heap:
+            rank, entry_id = self._heap[0]
+            if self._rank.get(entry_id) == rank:
+                return self._entries[entry_id]
+            heapq.heappop(self._heap)
+        return None
+
+
+    def remove(self, entry_id: int) -> QueueEntry | None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            self._discard(entry)
+        return entry
+
+
+    def move(self, entry_id: int, to_front: bool) -> bool:
+        """Pin an entry ahead of (or behind) every vote count."""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if to_front:
+            self._pins -= 1
+            self._set_rank(entry, self._pins)
+        else:
+            self._back_pins += 1
+            self._set_rank(entry, self._back_pins)
+        return True
+
+
+    def clear(self) -> int:
+        count = super().clear()
+        self._by_song.clear()
+        self._rank.clear()
+        self._heap.clear()
+        self._back_heap.clear()
+        self._voters.clear()
+        self._pending.clear()
+        self._pins = 0
+        self._back_pins = 0
+        return count
+
+
+    def songs(self) -> list[str]:
+        return [entry.song for entry in self.entries()]
+
+
+    def entries(self) -> list[QueueEntry]:
+        """Entries in play order. O(n log n); callers cache per queue version."""
+        return [self._entries[entry_id] for entry_id in sorted(self._rank, key=self._rank.__getitem__)]
+
+
+    def scheduler_info(self) -> dict:
+        return {"policy": "votes", "active_requesters": len(self._pending)}
+
+
+class FairShareQueue(VotedSongQueue):
+    """
+    Voted queue served round-robin across requesters.
+    Every request or vote gives that client a turn holding the entry, kept
+    in a per-requester FIFO; the ring of requesters is an OrderedDict, so
+    the next song is the head requester's oldest live turn, after which
+    they move to the back. A song with many votes appears in many turns and
+    plays early, while one client sending many requests gets only their
+    share. Turns for entries already played are skipped lazily, keeping a
+    pick O(1) amortised. Entries pinned by an admin still play first.
+    """
+
+    ANONYMOUS = ""
+
+    def __init__(self, queue_type: str, capacity: int, decisions: int = 20):
+        super().__init__(queue_type, capacity)
+        self._turns: OrderedDict[str, deque[int]] = OrderedDict()
+        # Requesters holding a turn for each entry, so a move skips the others
+        self._holders: dict[int, list[str]] = {}
+        self.decisions: deque[dict] = deque(maxlen=decisions)
+
+
+    def _take_turn(self, requester: str, entry_id: int):
+        turns = self._turns.get(requester)
+        if turns is None:
+            turns = self._turns[requester] = deque()
+        turns.append(entry_id)
+        self._holders.setdefault(entry_id, []).append(requester)
+
+
+    def _discard(self, entry: QueueEntry):
+        super()._discard(entry)
+        self._holders.pop(entry.id, None)
+
+
+    def _pinned(self) -> QueueEntry | None:
+        entry = super().peek()
+        if entry is not None and self._rank[entry.id][0] < 0:
+            return entry
+        return None
+
+
+    def _next_turn(self) -> tuple[str, deque[int]] | None:
+        """Head of the ring, with turns for played or removed entries dropped."""
+        while self._turns:
+            requester, turns = next(iter(self._turns.items()))
+            while turns and turns[0] not in self._entries:
+                turns.popleft()
+            if turns:
+                return requester, turns
+            del self._turns[requester]
+        return None
+
+
+    def _record(self, entry: QueueEntry, requester: str | None, reason: str):
+        self.decisions.append({
+            "song": entry.song,
+            "id": entry.id,
+            "votes": entry.votes,
+            "requester": requester[:8] if requester else None,
+            "reason": reason,
+            "waiting_requesters": len(self._turns),
+            "at": time.time()
+        })
+
+
+    def push(self, entry: QueueEntry, front: bool = False, voter: str | None = None):
+        super().push(entry, front, voter)
+        self._take_turn(voter or self.ANONYMOUS, entry.id)
+
+
+    def vote(self, entry: QueueEntry, voter: str | None = None, count: int = 1) -> bool:
+        counted = super().vote(entry, voter, count)
+        if counted and voter:
+            self._take_turn(voter, entry.id)
+        return counted
+
+
+    def pop(self) -> QueueEntry | None:
+        """Remove and return a pinned entry, else the next requester's turn."""
+        if self._pinned() is not None:
+            entry = super().pop()
+            self._record(entry, None, "pinned")
+            return entry
+        head = self._next_turn()
+        if head is None:
+            return None
+        requester, turns = head
+        entry = self.remove(turns.popleft())
+        if turns:
+            self._turns.move_to_end(requester)
+        else:
+            del self._turns[requester]
+        self._record(entry, requester, "turn")
+        return entry
+
+
+    def peek(self) -> QueueEntry | None:
+        pinned = self._pinned()
+        if pinned is not None:
+            return pinned
+        head = self._next_turn()
+        return self._entries[head[1][0]] if head else None
+
+
+    def move(self, entry_id: int, to_front: bool) -> bool:
+        """Pin an entry to play next, or send its turns to the back of the ring."""
+        if not super().move(entry_id, to_front):
+            return False
+        if not to_front:
+            for requester in self._holders.get(entry_id, ()):
+                turns = self._turns.get(requester)
+                if turns is None or entry_id not in turns:
+                    continue
+                turns.remove(entry_id)
+                turns.append(entry_id)
+                self._turns.move_to_end(requester)
+        return True
+
+
+    def clear(self) -> int:
+        self._turns.clear()
+        self._holders.clear()
+        return super().clear()
+
+
+    def entries(self) -> list[QueueEntry]:
+        """Predicted play order: pinned entries, then round-robin turns."""
+        order = [entry for entry in super().entries() if self._rank[entry.id][0] < 0]
+        seen = {entry.id for entry in order}
+        cursors = [iter(turns) for turns in self._turns.values()]
+        while cursors:
+            remaining = []
+            for cursor in cursors:
+                for entry_id in cursor:
+                    if entry_id in self._entries and entry_id not in seen:
+                        seen.add(entry_id)
+                        order.append(self._entries[entry_id])
+                        remaining.append(cursor)
+                        break
+            cursors = remaining
+        return order
+
+
+    def scheduler_info(self) -> dict:
+        return {
+            "policy": "fair_share",
+            "active_requesters": len(self._pending),
+            "recent_decisions": list(self.decisions)
+        }
+
+
+class RecentSongs:
+    """
+    Ring buffer of the last `window` songs played, with a counter for O(1)
+    membership checks. A window of 0 disables the check.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._songs: deque[str] = deque()
+        self._counts: Counter = Counter()
+
+
+    def __contains__(self, song: str) -> bool:
+        return self._counts[song] > 0
+
+
+    def add(self, song: str):
+        if self.window <= 0:
+            return
+        self._songs.append(song)
+        self._counts[song] += 1
+        if len(self._songs) > self.window:
+            oldest = self._songs.popleft()
+            self._counts[oldest] -= 1
+            if not self._counts[oldest]:
+                del self._counts[oldest]
+
+
+    def songs(self) -> list[str]:
+        return list(self._songs)
@@ -0,0 +1,215 @@
+
+import os
+import time
+import secrets
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import httpx
+
+from backend.utils.metrics import play_stage_seconds
+
+
+# Songs kept in the trace ring buffer
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '200'))
+# OTLP/HTTP JSON collector URL, e.g. http://otel-collector:4318/v1/traces (off when unset)
+OTLP_TRACES_ENDPOINT = os.getenv('OTLP_TRACES_ENDPOINT')
+OTLP_TIMEOUT = 5
+SERVICE_NAME = "lightshow-dash"
+
+# Stages that are dead air rather than music
+DEAD_TIME_STAGES = ("wait", "lights_off", "settle", "start", "detect_end", "lights_on")
+
+
+@dataclass
+class Span:
+    name: str
+    start_ns: int
+    end_ns: int | None = None
+    status: str = "ok"
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float | None:
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "status": self.status,
+            **({"attributes": self.attributes} if self.attributes else {})
+        }
+
+
+@dataclass
+class SongTrace:
+    """One song's trip through the player: a root span and its stages."""
+    song: str
+    song_file: str
+    root: Span
+    trace_id: str = field(default_factory=lambda: secrets.token_hex(16))
+    stages: list[Span] = field(default_factory=list)
+
+    def dead_seconds(self) -> float:
+        return sum(span.seconds or 0 for span in self.stages if span.name in DEAD_TIME_STAGES)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "song": self.song,
+            "song_file": self.song_file,
+            "status": self.root.status,
+            "total_seconds": round(self.root.seconds, 3) if self.root.seconds is not None else None,
+            "dead_seconds": round(self.dead_seconds(), 3),
+            "stages": [span.to_dict() for span in self.stages]
+        }
+
+
+_current: contextvars.ContextVar[SongTrace | None] = contextvars.ContextVar("play_trace", default=None)
+
+
+class PlayTracer:
+    """
+    Span-style timing of each song's play lifecycle.
+    The player opens a trace per song; play_song marks its stages with
+    stage(), which finds the trace through a context variable and is a
+    no-op outside one. Finished traces go to a bounded ring buffer, a
+    per-stage histogram, and optionally an OTLP/HTTP JSON collector.
+    The gap since the previous song finished is recorded as "wait".
+    """
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE, endpoint: str | None = OTLP_TRACES_ENDPOINT):
+        self.traces: deque[SongTrace] = deque(maxlen=capacity)
+        self.endpoint = endpoint
+        self._last_end_ns: int | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._exports: set[asyncio.Task] = set()
+        self.export_failures = 0
+
+
+    def begin(self, song: str, song_file: str) -> SongTrace:
+        now = time.time_ns()
+        start = self._last_end_ns if self._last_end_ns is not None else now
+        trace = SongTrace(song=song, song_file=song_file, root=Span("play_song", start))
+        if self._last_end_ns is not None:
+            self._add(trace, Span("wait", start, now))
+        _current.set(trace)
+        return trace
+
+
+    def idle(self):
+        """The player has nothing to play; the next song records no wait."""
+        self._last_end_ns = None
+
+
+    def _add(self, trace: SongTrace, span: Span):
+        trace.stages.append(span)
+        play_stage_seconds.observe(span.seconds, span.name)
+
+
+    @contextmanager
+    def stage(self, name: str, **attributes):
+        """Time the wrapped block as a stage of the current song, if any."""
+        trace = _current.get()
+        if trace is None:
+            yield
+            return
+        span = Span(name, time.time_ns(), attributes=attributes)
+        try:
+            yield
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            self._add(trace, span)
+
+
+    def finish(self, trace: SongTrace, status: str = "ok", error: str | None = None):
+        trace.root.end_ns = self._last_end_ns = time.time_ns()
+        trace.root.status = status
+        if error:
+            trace.root.attributes["error"] = error
+        _current.set(None)
+        self.traces.append(trace)
+        if self.endpoint:
+            task = asyncio.create_task(self._export(trace))
+            self._exports.add(task)
+            task.add_done_callback(self._exports.discard)
+
+
+    def recent(self, limit: int = 20) -> list[dict]:
+        return [trace.to_dict() for trace in list(self.traces)[-limit:]][::-1]
+
+
+    def breakdown(self) -> dict:
+        """Average seconds per stage over the buffered songs."""
+        totals: dict[str, list[float]] = {}
+        for trace in self.traces:
+            for span in trace.stages:
+                totals.setdefault(span.name, []).append(span.seconds or 0)
+        songs = len(self.traces)
+        return {
+            "songs": songs,
+            "avg_seconds": {name: round(sum(values) / len(values), 3) for name, values in totals.items()},
+            "avg_dead_seconds": round(sum(trace.dead_seconds() for trace in self.traces) / songs, 3) if songs else 0.0
+        }
+
+
+    @staticmethod
+    def _otlp_span(trace: SongTrace, span: Span, parent: Span | None) -> dict:
+        attributes = {"song": trace.song, "song_file": trace.song_file, **span.attributes}
+        return {
+            "traceId": trace.trace_id,
+            "spanId": span.span_id,
+            **({"parentSpanId": parent.span_id} if parent else {}),
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [{"key": key, "value": {"stringValue": str(value)}} for key, value in attributes.items()],
+            "status": {"code": 2 if span.status == "error" else 1}
+        }
+
+
+    def to_otlp(self, traces: list[SongTrace] | None = None) -> dict:
+        """OTLP/JSON ExportTraceServiceRequest for the given (default: buffered) traces."""
+        spans = []
+        for trace in self.traces if traces is None else traces:
+            spans.append(self._otlp_span(trace, trace.root, None))
+            spans.extend(self._otlp_span(trace, span, trace.root) for span in trace.stages)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": "backend.utils.tracing"}, "spans": spans}]
+            }]
+        }
+
+
+    async def _export(self, trace: SongTrace):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=OTLP_TIMEOUT)
+        try:
+            response = await self._client.post(self.endpoint, json=self.to_otlp([trace]))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.export_failures += 1
+            print(f"[TRACING] Failed to export trace for {trace.song}: {e}")
+
+
+    async def close(self):
+        if self._exports:
+            await asyncio.gather(*self._exports, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Create a global instance for the application to use
+play_tracer = PlayTracer()
@@ -0,0 +1,243 @@
+
+import os
+import json
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from dataclasses import dataclass, field, asdict
+
+import httpx
+
+from backend.utils.redis_client import get_redis_client
+from backend.utils.metrics import webhook_deliveries, webhook_pending
+
+
+N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL')
+N8N_WEBHOOK_URL_PLAYEDAUDIO = os.getenv('N8N_WEBHOOK_URL_PLAYEDAUDIO')
+N8N_TOKEN = os.getenv('N8N_TOKEN')
+
+WEBHOOK_OUTBOX_MAX = int(os.getenv('WEBHOOK_OUTBOX_MAX', '1000'))
+# Events taken off the queue per pass and delivered concurrently
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '20'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '6'))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))
+# Persist undelivered events to Redis on shutdown and reload them on startup
+WEBHOOK_OUTBOX_REDIS = os.getenv('WEBHOOK_OUTBOX_REDIS', '0') == '1'
+OUTBOX_REDIS_KEY = "webhook_outbox:pending"
+
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 300
+# How long shutdown waits for in-flight and queued events before persisting them
+SHUTDOWN_DRAIN_SECONDS = 5
+
+
+@dataclass
+class WebhookEvent:
+    url: str
+    payload: dict
+    kind: str
+    attempts: int = 0
+    created_at: float = field(default_factory=time.time)
+
+
+class WebhookOutbox:
+    """
+    Background delivery of N8N notifications.
+    Request handlers enqueue and return immediately; a single worker drains
+    the bounded queue in batches over one pooled client, retrying failures
+    with exponential backoff. Events that do not fit are dropped and counted.
+    """
+
+    def __init__(self, max_size: int = WEBHOOK_OUTBOX_MAX, token: str | None = N8N_TOKEN):
+        self.max_size = max_size
+        self.token = token
+        self._queue: asyncio.Queue[WebhookEvent] | None = None
+        self._retries: list[tuple[float, int, WebhookEvent]] = []
+        self._retry_ids = itertools.count()
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        self._in_flight = 0
+        self.stats_by_kind: dict[str, dict] = {}
+        self.last_error: str | None = None
+
+
+    def _kind_stats(self, kind: str) -> dict:
+        return self.stats_by_kind.setdefault(kind, {
+            "enqueued": 0,
+            "delivered": 0,
+            "failed_attempts": 0,
+            "dropped_overflow": 0,
+            "dropped_exhausted": 0,
+            "total_latency_seconds": 0.0
+        })
+
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._client = httpx.AsyncClient(
+            timeout=WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(max_connections=WEBHOOK_BATCH_SIZE, max_keepalive_connections=4)
+        )
+        if WEBHOOK_OUTBOX_REDIS:
+            await self._restore()
+        self._task = asyncio.create_task(self._worker(), name="webhook-outbox")
+
+
+    async def stop(self):
+        if self._task is None:
+            return
+        deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+        while (self._queue.qsize() or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        if WEBHOOK_OUTBOX_REDIS:
+            await self._persist()
+        elif self.pending():
+            print(f"[WEBHOOK] Dropping {self.pending()} undelivered events on shutdown")
+        await self._client.aclose()
+
+
+    def enqueue(self, url: str | None, payload: dict, kind: str) -> bool:
+        """
+        Queue a notification without waiting on the network.
+        Returns False if the webhook is not configured or the outbox is full.
+        """
+        if not url or not self.token or self._queue is None:
+            return False
+        stats = self._kind_stats(kind)
+        try:
+            self._queue.put_nowait(WebhookEvent(url=url, payload=payload, kind=kind))
+        except asyncio.QueueFull:
+            stats["dropped_overflow"] += 1
+            webhook_deliveries.inc(kind, "dropped_overflow")
+            print(f"[WEBHOOK] Outbox full, dropped {kind} event")
+            return False
+        stats["enqueued"] += 1
+        return True
+
+
+    def pending(self) -> int:
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + len(self._retries) + self._in_flight
+
+
+    def stats(self) -> dict:
+        kinds = {}
+        for kind, stats in self.stats_by_kind.items():
+            delivered = stats["delivered"]
+            kinds[kind] = {
+                **{name: value for name, value in stats.items() if name != "total_latency_seconds"},
+                "avg_latency_ms": round(stats["total_latency_seconds"] / delivered * 1000, 1) if delivered else 0.0
+            }
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "retrying": len(self._retries),
+            "in_flight": self._in_flight,
+            "capacity": self.max_size,
+            "last_error": self.last_error,
+            "kinds": kinds
+        }
+
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            self._in_flight = len(batch)
+            try:
+                await asyncio.gather(*(self._deliver(event) for event in batch))
+            finally:
+                self._in_flight = 0
+
+
+    async def _next_batch(self) -> list[WebhookEvent]:
+        """Wait for new events or the next due retry, then take up to a batch."""
+        while True:
+            now = time.monotonic()
+            batch = []
+            while self._retries and self._retries[0][0] <= now and len(batch) < WEBHOOK_BATCH_SIZE:
+                batch.append(heapq.heappop(self._retries)[2])
+            while not self._queue.empty() and len(batch) < WEBHOOK_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+            if batch:
+                return batch
+
+            timeout = self._retries[0][0] - now if self._retries else None
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                continue
+            self._queue.put_nowait(event)
+
+
+    async def _deliver(self, event: WebhookEvent):
+        stats = self._kind_stats(event.kind)
+        event.attempts += 1
+        start = time.perf_counter()
+        try:
+            response = await self._client.post(
+                event.url,
+                json=event.payload,
+                headers={"Authorization": f"Bearer {self.token}"}
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            stats["failed_attempts"] += 1
+            webhook_deliveries.inc(event.kind, "failed_attempt")
+            self.last_error = f"{event.kind}: {e}"
+            if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                stats["dropped_exhausted"] += 1
+                webhook_deliveries.inc(event.kind, "dropped_exhausted")
+                print(f"[WEBHOOK] Giving up on {event.kind} event after {event.attempts} attempts: {e}")
+                return
+            delay = min(RETRY_BASE_SECONDS * 2 ** (event.attempts - 1), RETRY_MAX_SECONDS)
+            delay *= random.uniform(0.8, 1.2)
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._retry_ids), event))
+            return
+        stats["delivered"] += 1
+        webhook_deliveries.inc(event.kind, "delivered")
+        stats["total_latency_seconds"] += time.perf_counter() - start
+
+
+    def _drain(self) -> list[WebhookEvent]:
+        events = [event for _, _, event in sorted(self._retries)]
+        self._retries = []
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return events
+
+
+    async def _persist(self):
+        events = self._drain()
+        if not events:
+            return
+        try:
+            await get_redis_client().rpush(OUTBOX_REDIS_KEY, *[json.dumps(asdict(event)) for event in events])
+            print(f"[WEBHOOK] Saved {len(events)} undelivered events to Redis")
+        except Exception as e:
+            print(f"[WEBHOOK] Failed to save {len(events)} undelivered events: {e}")
+
+
+    async def _restore(self):
+        try:
+            client = get_redis_client()
+            pipe = client.pipeline(transaction=True)
+            pipe.lrange(OUTBOX_REDIS_KEY, 0, -1)
+            pipe.delete(OUTBOX_REDIS_KEY)
+            saved, _ = await pipe.execute()
+        except Exception as e:
+            print(f"[WEBHOOK] Could not restore saved events: {e}")
+            return
+        for raw in saved[:self.max_size]:
+            self._queue.put_nowait(WebhookEvent(**json.loads(raw)))
+        if saved:
+            print(f"[WEBHOOK] Restored {min(len(saved), self.max_size)} saved events")
+
+
+# Create a global instance for the application to use
+webhook_outbox = WebhookOutbox()
+webhook_pending.collect_with(lambda: {(): webhook_outbox.pending()})
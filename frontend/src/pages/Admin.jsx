@@ -16,6 +16,7 @@ const Admin = () => {
     const [queueStatus, setQueueStatus] = useState({
         admin_queue: [],
         requested_queue: [],
+        requested_votes: [],
         system_queue: [],
         current_song: null
     });
@@ -230,6 +231,9 @@ const Admin = () => {
                                         <div key={index} className="queue-item">
                                             <span className="queue-num">{index + 1}</span>
                                             <span>{song}</span>
+                                            {queueStatus.requested_votes?.[index] > 1 && (
+                                                <span className="vote-count">{queueStatus.requested_votes[index]}</span>
+                                            )}
                                         </div>
                                     ))
                                 ) : (
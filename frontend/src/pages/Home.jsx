@@ -11,20 +11,31 @@ const Home = () => {
     const [queueStatus, setQueueStatus] = useState({
         admin_queue: [],
         requested_queue: [],
+        requested_votes: [],
         system_queue: [],
         current_song: null
     });
     const [songRequestText, setSongRequestText] = useState('');
     const [bannerContent, setBannerContent] = useState(null);
+    const [showHours, setShowHours] = useState('5:00 PM - 9:00 PM');
 
     useEffect(() => {
         loadSongs();
-        loadQueueStatus();
         loadBanner();
+        loadSchedule();
 
-        // Poll queue status every 5 seconds
-        const interval = setInterval(loadQueueStatus, 5000);
-        return () => clearInterval(interval);
+        // Prefer the push stream; fall back to polling every 5 seconds
+        if (typeof EventSource === 'undefined') {
+            loadQueueStatus();
+            const interval = setInterval(loadQueueStatus, 5000);
+            return () => clearInterval(interval);
+        }
+
+        const source = new EventSource('/api/songs/queue/stream');
+        source.onmessage = (event) => {
+            setQueueStatus(JSON.parse(event.data));
+        };
+        return () => source.close();
     }, []);
 
     const loadSongs = async () => {
@@ -54,6 +65,15 @@ const Home = () => {
         }
     };
 
+    const loadSchedule = async () => {
+        try {
+            const response = await api.get('/songs/schedule');
+            setShowHours(response.data.hours_today || 'No show tonight');
+        } catch (error) {
+            console.error('Failed to load schedule:', error);
+        }
+    };
+
     const handleSongSelect = async (song) => {
         try {
             const response = await api.post('/songs/request', { song });
@@ -90,9 +110,13 @@ const Home = () => {
         }
     };
 
+    const requestedVotes = queueStatus.requested_votes || [];
     const combinedQueue = [
-        ...queueStatus.admin_queue,
-        ...queueStatus.requested_queue
+        ...queueStatus.admin_queue.map((song) => ({ song, votes: 0 })),
+        ...queueStatus.requested_queue.map((song, index) => ({
+            song,
+            votes: requestedVotes[index] || 1
+        }))
     ];
 
     return (
@@ -125,7 +149,7 @@ const Home = () => {
 
                         <div className="time-badge">
                             <Clock size={20} />
-                            <span>Available 5:00 PM - 9:00 PM</span>
+                            <span>Available {showHours}</span>
                         </div>
                     </div>
                 </div>
@@ -167,10 +191,13 @@ const Home = () => {
                         {combinedQueue.length > 0 ? (
                             <div className="queue-list">
                                 <h3>Up Next ({combinedQueue.length})</h3>
-                                {combinedQueue.slice(0, 5).map((song, index) => (
+                                {combinedQueue.slice(0, 5).map(({ song, votes }, index) => (
                                     <div key={index} className="song-item">
                                         <span className="queue-number">{index + 1}</span>
                                         <span>{song}</span>
+                                        {votes > 1 && (
+                                            <span className="vote-count">{votes} votes</span>
+                                        )}
                                     </div>
                                 ))}
                                 {combinedQueue.length > 5 && (
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+from backend.utils.oauth_utils import AllowList
+
+
+class AllowListTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "allow_list.txt")
+
+
+    def _write(self, content: str):
+        with open(self.path, "w") as f:
+            f.write(content)
+
+
+    def test_unconfigured_list_allows_everyone(self):
+        self.assertTrue(AllowList("", None).allows("anyone@example.com"))
+
+
+    def test_missing_file_denies_everyone(self):
+        allow_list = AllowList("", self.path)
+        self.assertFalse(allow_list.allows("anyone@example.com"))
+
+
+    def test_empty_file_denies_everyone(self):
+        self._write("")
+        self.assertFalse(AllowList("", self.path).allows("anyone@example.com"))
+
+
+    def test_unreadable_file_keeps_previous_list(self):
+        self._write("admin@example.com\n")
+        allow_list = AllowList("", self.path)
+        self.assertTrue(allow_list.allows("Admin@example.com"))
+        os.remove(self.path)
+        self.assertTrue(allow_list.allows("admin@example.com"))
+        self.assertFalse(allow_list.allows("anyone@example.com"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from backend.utils import fpp_commands
+
+
+class PlayerStopTest(unittest.IsolatedAsyncioTestCase):
+    """An admin stop must wake a player sleeping through a known duration."""
+
+    async def test_stop_during_known_duration_returns_promptly(self):
+        busy = True
+
+        async def stop_playlists():
+            nonlocal busy
+            busy = False
+
+        async def is_busy():
+            return busy
+
+        client = mock.AsyncMock()
+        client.stop_playlists.side_effect = stop_playlists
+        client.is_busy.side_effect = is_busy
+        with mock.patch.object(fpp_commands, "IS_DEV", False), \
+                mock.patch.object(fpp_commands, "fpp_client", client):
+            player = asyncio.create_task(fpp_commands.play_song("long_song", duration=600))
+            await asyncio.wait_for(self._until_started(client), 3)
+            await fpp_commands.stop_song()
+            await asyncio.wait_for(player, 1)
+
+        client.start_playlist.assert_awaited_once_with("long_song.fseq")
+        client.stop_playlists.assert_awaited_once()
+
+
+    async def test_stop_before_next_song_does_not_skip_it(self):
+        with mock.patch.object(fpp_commands, "IS_DEV", True):
+            await fpp_commands.stop_song()
+            player = asyncio.create_task(fpp_commands.play_song("next_song", duration=0.2))
+            await asyncio.sleep(0.05)
+            self.assertFalse(player.done())
+            await asyncio.wait_for(player, 1)
+
+
+    @staticmethod
+    async def _until_started(client):
+        while not client.start_playlist.await_count:
+            await asyncio.sleep(0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
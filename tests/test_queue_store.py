@@ -0,0 +1,46 @@
+import json
+import unittest
+from unittest import mock
+
+from fakeredis import FakeServer, FakeAsyncRedis
+
+from backend.utils import queue_store, redis_client
+from backend.utils.queue_store import QueueStore
+from backend.utils.queueing import SongQueueManager
+
+
+class QueueStoreRestoreTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        for patcher in (
+            mock.patch.object(redis_client, "_pool", self.redis.connection_pool),
+            mock.patch.object(queue_store, "QUEUE_PERSIST", True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.manager = SongQueueManager()
+        self.store = QueueStore(self.manager, key="test_queue_state")
+
+
+    async def test_round_trip(self):
+        self.manager.add_song("a", "admin")
+        self.manager.request_song("b", "v1")
+        await self.store.save()
+        manager = SongQueueManager()
+        self.assertEqual(await QueueStore(manager, key="test_queue_state").restore(), 2)
+        self.assertEqual(manager.peek_queues("admin"), ["a"])
+        self.assertEqual(manager.peek_queues("requested"), ["b"])
+
+
+    async def test_unreadable_state_is_set_aside(self):
+        for raw in ("{not json", json.dumps({"queues": {"requested": [{"song": "x"}]}})):
+            await self.redis.set("test_queue_state", raw)
+            self.assertEqual(await self.store.restore(), 0)
+            self.assertFalse(self.manager.has_pending())
+            self.assertIsNone(await self.redis.get("test_queue_state"))
+            self.assertEqual(await self.redis.get("test_queue_state:corrupt"), raw)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from backend.utils import queueing
+from backend.utils.queueing import SongQueueManager
+
+
+class NoBackToBackTest(unittest.TestCase):
+    """A song must never play twice in a row."""
+
+    def setUp(self):
+        patcher = mock.patch.object(queueing, "check_time", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = SongQueueManager()
+
+
+    def test_request_for_queued_system_song(self):
+        self.manager.add_song("X", "system")
+        self.manager.request_song("X", "v1")
+        self.assertEqual(self.manager.get_next_song(), "X")
+        self.assertIsNone(self.manager.get_next_song())
+
+
+    def test_admin_song_matching_queued_system_song(self):
+        self.manager.add_song("X", "system")
+        self.manager.add_song("Y", "system")
+        self.manager.add_song("X", "admin")
+        self.assertEqual(self.manager.get_next_song(), "X")
+        self.assertEqual(self.manager.get_next_song(), "Y")
+
+
+    def test_autofill_skips_last_played_even_as_fallback(self):
+        self.manager.add_song("X", "admin")
+        self.manager.get_next_song()
+        self.manager.set_current_song(None)
+        self.assertFalse(self.manager.can_autofill("X", allow_recent=True))
+
+
+class PlayingStateTest(unittest.TestCase):
+
+    def test_clearing_a_skipped_song_drops_it_from_saved_state(self):
+        manager = SongQueueManager()
+        manager.add_song("missing", "admin")
+        self.assertEqual(manager.get_next_song(), "missing")
+        version = manager.version
+        manager.set_current_song(None)
+        self.assertGreater(manager.version, version)
+        self.assertIsNone(manager.export_state()["playing"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from unittest import mock
+
+from fakeredis import FakeServer, FakeAsyncRedis
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from backend import dependencies
+from backend.utils import rate_limit, redis_client
+from backend.utils.rate_limit import RateLimit, RateLimiter, retry_after, RATE_LIMIT_SHARED_IP_FACTOR
+
+
+class MemoryLimiterTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(rate_limit.time, "monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter({"song_request": RateLimit(2, 10)}, backend="memory")
+
+
+    async def test_refills_evenly(self):
+        self.assertEqual(await self.limiter.check("song_request", "ip", "device"), 0)
+        self.assertEqual(await self.limiter.check("song_request", "ip", "device"), 0)
+        self.assertAlmostEqual(await self.limiter.check("song_request", "ip", "device"), 5)
+        self.now += 5
+        self.assertEqual(await self.limiter.check("song_request", "ip", "device"), 0)
+        self.assertEqual(self.limiter.stats()["limited"], {"song_request": 1})
+
+
+    async def test_shared_address_is_capped_across_device_cookies(self):
+        allowed = 0
+        for device in range(20):
+            for _ in range(2):
+                allowed += await self.limiter.check("song_request", "ip", f"device{device}") == 0
+        self.assertEqual(allowed, 2 * RATE_LIMIT_SHARED_IP_FACTOR)
+        # Another address is unaffected
+        self.assertEqual(await self.limiter.check("song_request", "other_ip", "device0"), 0)
+
+
+    async def test_disabled_limit_allows_everything(self):
+        limiter = RateLimiter({"song_request": None}, backend="memory")
+        for _ in range(100):
+            self.assertEqual(await limiter.check("song_request", "ip"), 0)
+
+
+class RedisLimiterTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        patcher = mock.patch.object(redis_client, "_pool", self.redis.connection_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = RateLimiter({"song_request": RateLimit(1, 60)}, backend="redis")
+
+
+    async def test_per_device_and_shared_buckets(self):
+        self.assertEqual(await self.limiter.check("song_request", "ip", "a"), 0)
+        self.assertAlmostEqual(await self.limiter.check("song_request", "ip", "a"), 60, delta=0.5)
+        for device in range(1, RATE_LIMIT_SHARED_IP_FACTOR):
+            self.assertEqual(await self.limiter.check("song_request", "ip", f"device{device}"), 0)
+        self.assertGreater(await self.limiter.check("song_request", "ip", "fresh_device"), 0)
+        self.assertTrue(await self.redis.exists("ratelimit:song_request:ip"))
+
+
+    async def test_falls_back_to_memory_when_redis_fails(self):
+        with mock.patch.object(rate_limit, "get_redis_client", side_effect=ConnectionError("down")):
+            self.assertEqual(await self.limiter.check("song_request", "ip", "a"), 0)
+            self.assertGreater(await self.limiter.check("song_request", "ip", "a"), 0)
+        self.assertEqual(len(self.limiter.memory.buckets), 2)
+
+
+class RetryAfterTest(unittest.TestCase):
+
+    def test_rounds_up_to_whole_seconds(self):
+        self.assertEqual(retry_after(4.2), "5")
+        self.assertEqual(retry_after(0.01), "1")
+
+
+    def test_limited_request_gets_429_with_retry_after(self):
+        app = FastAPI()
+
+        @app.post("/request", dependencies=[Depends(dependencies.rate_limit("song_request"))])
+        async def request_song():
+            return {"ok": True}
+
+        limiter = RateLimiter({"song_request": RateLimit(1, 30)}, backend="memory")
+        with mock.patch.object(dependencies, "rate_limiter", limiter):
+            client = TestClient(app)
+            self.assertIn(dependencies.DEVICE_COOKIE, client.post("/request").cookies)
+            client.cookies.set(dependencies.DEVICE_COOKIE, "device1")
+            self.assertEqual(client.post("/request").status_code, 200)
+            second = client.post("/request")
+            self.assertEqual(second.status_code, 429)
+            self.assertEqual(second.headers["Retry-After"], "30")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import time
+import unittest
+from unittest import mock
+
+from fakeredis import FakeServer, FakeAsyncRedis
+
+from backend.utils import redis_client
+from backend.utils.redis_client import (
+    ROTATED,
+    REUSE_DETECTED,
+    EXPIRED,
+    ROTATION_GRACE_SECONDS,
+    REUSE_DETECTION_SECONDS,
+    store_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    get_refresh_token_data
+)
+
+EMAIL = "admin@example.com"
+TTL = 30 * 24 * 60 * 60
+
+
+class RefreshRotationTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.redis = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+        patcher = mock.patch.object(redis_client, "_pool", self.redis.connection_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        await store_refresh_token("old", EMAIL, TTL)
+
+
+    async def _sessions(self) -> list[str]:
+        return await self.redis.zrange(f"user_sessions:{EMAIL}", 0, -1)
+
+
+    async def test_rotate_once(self):
+        self.assertEqual(await rotate_refresh_token("old", "new", TTL), (ROTATED, EMAIL))
+        self.assertTrue((await get_refresh_token_data("old")).revoked)
+        self.assertFalse((await get_refresh_token_data("new")).revoked)
+        self.assertEqual(await self._sessions(), ["new"])
+        # The rotated-out token is only kept for reuse detection
+        self.assertLessEqual(
+            await self.redis.ttl("refresh_token:old"),
+            ROTATION_GRACE_SECONDS + REUSE_DETECTION_SECONDS
+        )
+
+
+    async def test_reuse_inside_grace_window_rotates_again(self):
+        await rotate_refresh_token("old", "tab1", TTL)
+        self.assertEqual(await rotate_refresh_token("old", "tab2", TTL), (ROTATED, EMAIL))
+        self.assertEqual(sorted(await self._sessions()), ["tab1", "tab2"])
+
+
+    async def test_reuse_after_grace_window_revokes_every_session(self):
+        await store_refresh_token("other_device", EMAIL, TTL)
+        await rotate_refresh_token("old", "new", TTL)
+        later = time.time() + ROTATION_GRACE_SECONDS + 1
+        with mock.patch.object(redis_client.time, "time", return_value=later):
+            self.assertEqual(await rotate_refresh_token("old", "stolen", TTL), (REUSE_DETECTED, EMAIL))
+        for token_hash in ("new", "other_device", "stolen"):
+            self.assertIsNone(await get_refresh_token_data(token_hash))
+        self.assertEqual(await self._sessions(), [])
+
+
+    async def test_revoked_token_is_rejected(self):
+        await revoke_refresh_token("old")
+        self.assertEqual(await rotate_refresh_token("old", "new", TTL), (EXPIRED, None))
+        self.assertIsNone(await get_refresh_token_data("new"))
+
+
+    async def test_unknown_token_is_rejected(self):
+        self.assertEqual(await rotate_refresh_token("never_issued", "new", TTL), (EXPIRED, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import json
+import datetime
+import tempfile
+import unittest
+
+from backend.utils.schedule import ShowSchedule
+
+
+EVENING = datetime.datetime(2026, 12, 20, 18, 30)
+
+
+class MalformedScheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "schedule.json")
+
+
+    def _write(self, config):
+        with open(self.path, "w") as f:
+            f.write(config if isinstance(config, str) else json.dumps(config))
+
+
+    def test_malformed_file_keeps_previous_schedule(self):
+        self._write({"default": {"start": "18:00", "end": "19:00"}})
+        schedule = ShowSchedule(self.path)
+        self.assertTrue(schedule.is_open(EVENING))
+
+        for malformed in (
+            {"dates": ["2026-12-24"]},
+            {"default": {"start": "18:00", "end": "19:00"}, "dates": {"2026-12-20": "closed"}},
+            {"default": {"start": 1800}},
+            ["2026-12-24"],
+            "{not json",
+        ):
+            self._write(malformed)
+            self.assertTrue(schedule.is_open(EVENING), malformed)
+            self.assertTrue(schedule.is_open(EVENING + datetime.timedelta(minutes=20)), malformed)
+
+
+if __name__ == "__main__":
+    unittest.main()
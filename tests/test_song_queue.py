@@ -0,0 +1,38 @@
+import unittest
+
+from backend.utils.song_queue import VotedSongQueue, FairShareQueue, QueueEntry
+
+
+def _queue(cls, songs):
+    queue = cls("requested", 100)
+    for entry_id, (song, voter) in enumerate(songs, start=1):
+        queue.push(QueueEntry(entry_id, song, "requested"), voter=voter)
+    return queue
+
+
+class VotedSongQueueTest(unittest.TestCase):
+
+    def test_moved_to_back_in_order_and_popped_from_back(self):
+        queue = _queue(VotedSongQueue, [("a", "v1"), ("b", "v2"), ("c", "v3")])
+        queue.vote(queue.find("a"), "v4")
+        queue.move(queue.find("a").id, to_front=False)
+        queue.move(queue.find("b").id, to_front=False)
+        self.assertEqual(queue.songs(), ["c", "a", "b"])
+        self.assertEqual(queue.pop_back().song, "b")
+        self.assertEqual(queue.pop_back().song, "a")
+        self.assertEqual(queue.pop().song, "c")
+        self.assertIsNone(queue.pop_back())
+
+
+class FairShareQueueTest(unittest.TestCase):
+
+    def test_move_to_back_moves_every_holder(self):
+        queue = _queue(FairShareQueue, [("a", "v1"), ("b", "v1"), ("c", "v2")])
+        queue.vote(queue.find("a"), "v3")
+        queue.move(queue.find("a").id, to_front=False)
+        self.assertEqual(queue.songs(), ["c", "b", "a"])
+        self.assertEqual([queue.pop().song for _ in range(3)], ["c", "b", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
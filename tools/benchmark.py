@@ -0,0 +1,171 @@
+"""
+End-to-end request-to-playback benchmark.
+
+Sends bursts of public song requests through the backend, waits for the
+FPP simulator to play them, and reports API latency, queue wait (request
+to sequence start), dead time between songs and FPP calls per song.
+
+    python -m tools.fpp_simulator --song-length 5 &
+    IS_DEV=0 FPP_IP=127.0.0.1:8765 uvicorn backend.main:app &
+    python -m tools.benchmark --bursts 3 --burst-size 10
+
+The backend's show window must be open. Run it with AUTOFILL=0 so only
+requested songs play, and with the limits off so every request creates an
+entry: RATE_LIMIT_SONG_REQUEST=0, MAX_PENDING_PER_REQUESTER=0 and
+NO_REPEAT_WINDOW=0. Each request is sent from its own client address via
+X-Forwarded-For, which the backend honours from a local proxy.
+Only requests that created a new queue entry are timed; votes and repeats
+share an entry and play once.
+"""
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from collections import defaultdict, deque
+
+import httpx
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(label: str, values: list[float], unit: str = "s", scale: float = 1.0):
+    if not values:
+        print(f"  {label:<24} n=0")
+        return
+    p50, p90, p99 = (percentile(values, p) * scale for p in (50, 90, 99))
+    print(f"  {label:<24} n={len(values):<4} p50={p50:.3f}{unit} p90={p90:.3f}{unit} "
+          f"p99={p99:.3f}{unit} max={max(values) * scale:.3f}{unit}")
+
+
+# Documentation range (RFC 5737), so no client address is mistaken for a proxy
+_client_addresses = (f"198.51.{n // 256 % 256}.{n % 256}" for n in itertools.count(1))
+
+
+def requested_plays(plays: list[dict], requested: dict[str, deque], file_to_song: dict[str, str]) -> list[tuple[float, dict]]:
+    """
+    Pair each new request with the first play of its song that started
+    after it, first-in first-out per song. Other plays are left out.
+    Returns (request time, play) pairs in play order.
+    """
+    pending = {song: deque(times) for song, times in requested.items()}
+    matched = []
+    for play in plays:
+        times = pending.get(file_to_song.get(play["playlist"]))
+        if times and times[0] <= play["started_at"]:
+            matched.append((times.popleft(), play))
+    return matched
+
+
+async def send_burst(client: httpx.AsyncClient, songs: list[str], size: int,
+                     requested: dict[str, deque], api_latency: list[float], failures: list[str],
+                     duplicates: list[str]):
+    async def one(song: str):
+        start = time.perf_counter()
+        sent_at = time.time()
+        address = next(_client_addresses)
+        headers = {"X-Forwarded-For": address, "X-Real-IP": address}
+        try:
+            response = await client.post("/api/songs/request", json={"song": song}, headers=headers)
+        except httpx.HTTPError as e:
+            failures.append(f"{song}: {e}")
+            return
+        api_latency.append(time.perf_counter() - start)
+        if response.status_code == 200:
+            body = response.json()
+            # A vote or a repeat joins an existing entry, which plays once
+            if body.get("votes") == 1 and "already requested" not in body.get("message", ""):
+                requested[song].append(sent_at)
+            else:
+                duplicates.append(song)
+        else:
+            failures.append(f"{song}: HTTP {response.status_code} {response.text[:80]}")
+
+    await asyncio.gather(*(one(random.choice(songs)) for _ in range(size)))
+
+
+async def run(args):
+    async with httpx.AsyncClient(base_url=args.api, timeout=30) as api, \
+               httpx.AsyncClient(base_url=args.fpp, timeout=10) as fpp:
+        catalog = (await api.get("/api/songs/list")).json()["songs"]
+        songs = list(catalog)[:args.distinct] if args.distinct else list(catalog)
+        file_to_song = {f"{song_file}.fseq": song for song, song_file in catalog.items()}
+
+        await fpp.post("/sim/reset")
+        requested: dict[str, deque] = defaultdict(deque)
+        api_latency: list[float] = []
+        failures: list[str] = []
+        duplicates: list[str] = []
+
+        bench_start = time.time()
+        for burst in range(args.bursts):
+            await send_burst(api, songs, args.burst_size, requested, api_latency, failures, duplicates)
+            print(f"[BENCH] Burst {burst + 1}/{args.bursts} sent")
+            if burst + 1 < args.bursts:
+                await asyncio.sleep(args.interval)
+
+        accepted = sum(len(times) for times in requested.values())
+        deadline = time.time() + args.timeout
+        stats = {}
+        while time.time() < deadline:
+            stats = (await fpp.get("/sim/stats")).json()
+            finished = [p for p in stats["plays"] if p["ended_at"] and p["started_at"] >= bench_start]
+            if len(requested_plays(finished, requested, file_to_song)) >= accepted:
+                break
+            await asyncio.sleep(1)
+        else:
+            print(f"[BENCH] Timed out waiting for playback of {accepted} songs")
+
+    plays = sorted((p for p in stats.get("plays", []) if p["started_at"] >= bench_start),
+                   key=lambda p: p["started_at"])
+
+    matched = requested_plays(plays, requested, file_to_song)
+    waits = [play["started_at"] - sent_at for sent_at, play in matched]
+
+    gaps = [
+        later["started_at"] - earlier["ended_at"]
+        for earlier, later in zip(plays, plays[1:])
+        if earlier["ended_at"]
+    ]
+
+    total_calls = sum(stats.get("calls", {}).values())
+    print()
+    print(f"Requests: {args.bursts} bursts x {args.burst_size} "
+          f"({accepted} new entries, {len(duplicates)} votes or repeats, {len(failures)} failed), "
+          f"{len(matched)} requested songs played ({len(plays)} in total)")
+    summarize("API latency", api_latency, "ms", 1000)
+    summarize("Queue wait", waits)
+    summarize("Gap between songs", gaps)
+    if plays:
+        print(f"  {'FPP calls per song':<24} {total_calls / len(plays):.1f}")
+    for endpoint, count in sorted(stats.get("calls", {}).items()):
+        errors = stats.get("errors", {}).get(endpoint, 0)
+        print(f"    {endpoint:<40} {count:>6} calls {errors:>4} errors")
+    for failure in failures[:10]:
+        print(f"  ! {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--fpp", default="http://127.0.0.1:8765", help="FPP simulator base URL")
+    parser.add_argument("--bursts", type=int, default=3)
+    parser.add_argument("--burst-size", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between bursts")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="Only request the first N songs of the catalog (0 = all)")
+    parser.add_argument("--timeout", type=float, default=600.0,
+                        help="Seconds to wait for every accepted request to play")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
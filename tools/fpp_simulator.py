@@ -0,0 +1,181 @@
+"""
+Local stand-in for the Falcon Player HTTP API.
+
+Mimics the endpoints the backend uses (playlist start/stop, fppd status,
+commands, volume) with configurable latency, error rate and song length,
+and records every call so the benchmark can report on them.
+
+    python -m tools.fpp_simulator --port 8765 --song-length 12 --latency-ms 40
+
+Point the backend at it with FPP_IP=127.0.0.1:8765 and IS_DEV=0.
+"""
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from urllib.parse import unquote
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class SimulatorConfig:
+    latency_ms: float = 20.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    song_length: float = 10.0
+    song_length_jitter: float = 0.0
+
+
+config = SimulatorConfig()
+
+
+class FPPState:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.playlist = ""
+        self.started_at = 0.0
+        self.length = 0.0
+        self.volume = 70
+        self.effects: set[str] = set()
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.plays: list[dict] = []
+
+    def refresh(self):
+        """End the current sequence once its length has elapsed."""
+        if self.playlist and time.time() - self.started_at >= self.length:
+            self.plays[-1]["ended_at"] = self.started_at + self.length
+            self.playlist = ""
+
+    def start(self, name: str):
+        self.refresh()
+        if self.playlist:
+            self.stop()
+        self.playlist = name
+        self.started_at = time.time()
+        self.length = max(config.song_length + random.uniform(-1, 1) * config.song_length_jitter, 0.1)
+        self.plays.append({"playlist": name, "started_at": self.started_at, "ended_at": None})
+
+    def stop(self):
+        if self.playlist:
+            self.plays[-1]["ended_at"] = time.time()
+        self.playlist = ""
+
+
+state = FPPState()
+app = FastAPI(title="FPP simulator")
+
+
+def _endpoint(path: str) -> str:
+    """Group calls by endpoint, dropping per-song and per-argument path parts."""
+    parts = path.strip("/").split("/")
+    if parts[:2] == ["api", "playlist"]:
+        return "/api/playlist/{name}/" + parts[-1]
+    if parts[:2] == ["api", "command"] and len(parts) > 2:
+        return f"/api/command/{unquote(parts[2])}"
+    return path
+
+
+@app.middleware("http")
+async def simulate_network(request: Request, call_next):
+    if request.url.path.startswith("/sim/"):
+        return await call_next(request)
+
+    endpoint = _endpoint(request.url.path)
+    state.calls[endpoint] += 1
+    delay = config.latency_ms + random.uniform(-1, 1) * config.jitter_ms
+    await asyncio.sleep(max(delay, 0) / 1000)
+    if random.random() < config.error_rate:
+        state.errors[endpoint] += 1
+        return JSONResponse({"status": "ERROR", "message": "Simulated failure"}, status_code=500)
+    return await call_next(request)
+
+
+@app.get("/api/fppd/status")
+async def fppd_status():
+    state.refresh()
+    played = time.time() - state.started_at if state.playlist else 0
+    return {
+        "current_playlist": {"playlist": state.playlist},
+        "status_name": "playing" if state.playlist else "idle",
+        "seconds_played": f"{played:.0f}",
+        "seconds_remaining": f"{max(state.length - played, 0):.0f}" if state.playlist else "0",
+        "volume": state.volume
+    }
+
+
+@app.get("/api/playlist/{name}/start")
+async def start_playlist(name: str):
+    state.start(name)
+    return {"status": "OK", "message": f"Started {name}"}
+
+
+@app.get("/api/playlists/stop")
+async def stop_playlists():
+    state.stop()
+    return {"status": "OK"}
+
+
+@app.get("/api/command/{command:path}")
+async def run_command(command: str):
+    name, *args = [unquote(part) for part in command.split("/")]
+    if name == "Volume Set" and args:
+        state.volume = int(args[0])
+    elif name == "FSEQ Effect Start" and args:
+        state.effects.add(args[0])
+    elif name == "FSEQ Effect Stop" and args:
+        state.effects.discard(args[0])
+    return {"status": "OK", "command": name, "args": args}
+
+
+@app.get("/api/system/volume")
+async def get_volume():
+    return {"status": "OK", "volume": state.volume}
+
+
+@app.get("/sim/stats")
+async def sim_stats():
+    state.refresh()
+    return {
+        "calls": dict(state.calls),
+        "errors": dict(state.errors),
+        "plays": state.plays,
+        "playing": state.playlist,
+        "effects": sorted(state.effects)
+    }
+
+
+@app.post("/sim/reset")
+async def sim_reset():
+    state.reset()
+    return {"status": "OK"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate,
+                        help="Fraction of FPP calls that fail with HTTP 500")
+    parser.add_argument("--song-length", type=float, default=config.song_length,
+                        help="Seconds each sequence plays")
+    parser.add_argument("--song-length-jitter", type=float, default=config.song_length_jitter)
+    args = parser.parse_args()
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.error_rate = args.error_rate
+    config.song_length = args.song_length
+    config.song_length_jitter = args.song_length_jitter
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()